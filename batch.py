@@ -0,0 +1,35 @@
+import sys
+import argparse
+from pathlib import Path
+from core.batch import read_rows, generate_batch
+from core.pipeline import DOCUMENT_TYPES, get_document_type
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate one contract or invoice per row of a CSV/XLSX file.")
+    parser.add_argument("data", help="CSV or XLSX file with CLIENT, VENDOR, AMOUNT, LINE1, LINE2 columns")
+    parser.add_argument("--template", required=True, help="Contract or invoice template (.docx)")
+    parser.add_argument("--type", choices=sorted(DOCUMENT_TYPES), default="contract", help="Document type (default: contract)")
+    parser.add_argument("--output", help="Output folder (default: Downloads/nouveau_contrat or Downloads/Facture_new)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    output_folder = Path(args.output) if args.output else get_document_type(args.type).get_folder()
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    rows = read_rows(args.data)
+    result = generate_batch(
+        Path(args.template), rows, output_folder, workers=args.workers, document_type=args.type,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True),
+    )
+    print(file=sys.stderr)
+
+    for number, error in result.errors:
+        print(f"Row {number}: {error}", file=sys.stderr)
+    print(f"{len(result.generated)} of {result.total} documents saved here: {output_folder}"
+          + (f" ({len(result.reused)} already generated)" if result.reused else ""))
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
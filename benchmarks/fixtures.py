@@ -0,0 +1,71 @@
+import random
+import datetime
+from docx import Document
+import data.database as database
+
+FIELDS = {
+    "CLIENT": "Incubateur Nord",
+    "VENDOR": "Startup Alpha",
+    "AMOUNT": "1500",
+    "LINE1": "Accompagnement et hébergement",
+    "LINE2": "Programme de 6 mois",
+}
+
+
+def use_database(path):
+    """
+    Point the data layer at another database file.
+    """
+    database.DB_PATH = path
+    database._schema_ready = False
+
+
+def make_template(path, paragraphs=200):
+    """
+    Write a contract template using every form and computed field,
+    with a header, a footer, a table and the given number of body paragraphs.
+    """
+    document = Document()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Contrat {{ CLIENT }} / {{ VENDOR }}"
+    section.footer.paragraphs[0].text = "Signé le {{ TODAY }}"
+
+    document.add_heading("Contrat de prestation", level=1)
+    document.add_paragraph("Entre {{ CLIENT }} et {{ VENDOR }}, pour un montant de {{ AMOUNT }}.")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Montant non remboursable"
+    table.cell(0, 1).text = "{{ NONREFUNDABLE }}"
+    table.cell(1, 0).text = "Échéance"
+    table.cell(1, 1).text = "{{ TODAY_IN_ONE_WEEK }}"
+    for number in range(paragraphs):
+        paragraph = document.add_paragraph(f"Article {number + 1}. ")
+        paragraph.add_run("{{ LINE1 }}").bold = number % 3 == 0
+        paragraph.add_run(" - {{ LINE2 }}" if number % 2 else " Clause générale sans variable.")
+    document.save(path)
+    return path
+
+
+def make_rows(count, seed=0):
+    """
+    Return count (client, vendor, amount, line1, line2, date) rows spread over the last three years.
+    """
+    generator = random.Random(seed)
+    start = datetime.date.today() - datetime.timedelta(days=3 * 365)
+    return [
+        (
+            f"Client {number}",
+            f"Startup {generator.randrange(200)}",
+            str(generator.randrange(100, 50000)),
+            "Accompagnement",
+            "Programme",
+            (start + datetime.timedelta(days=generator.randrange(3 * 365))).isoformat(),
+        )
+        for number in range(count)
+    ]
+
+
+def make_field_rows(count):
+    """
+    Return count batch rows of form fields.
+    """
+    return [dict(FIELDS, CLIENT=f"Client {number}", VENDOR=f"Startup {number}") for number in range(count)]
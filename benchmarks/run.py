@@ -0,0 +1,284 @@
+"""
+Headless benchmarks of the generate / preview / export / dashboard hot paths.
+
+    python -m benchmarks.run                          # full run, 1k/10k/100k contracts
+    python -m benchmarks.run --quick                  # smaller sizes and fewer documents
+    python -m benchmarks.run --save-baseline          # store the results as the baseline
+    python -m benchmarks.run --baseline other.json    # compare against another run
+
+Results are written as JSON (benchmarks/results.json by default) and compared
+against benchmarks/baseline.json when it exists; the exit status is 1 when a
+metric is slower than the baseline by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+# Qt must run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import data.database as database
+from benchmarks.fixtures import FIELDS, make_template, make_rows, make_field_rows, use_database
+
+BENCHMARKS_FOLDER = Path(__file__).parent
+DEFAULT_SIZES = (1000, 10000, 100000)
+QUICK_SIZES = (1000, 10000)
+
+
+def time_ms(fn, repeat=5):
+    """
+    Return the median duration of fn() in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(value, 3), "unit": unit, "better": better}
+        print(f"  {name:<45} {value:12.2f} {unit}", flush=True)
+
+
+def bench_render(results, work, template, documents):
+    from core.pipeline import CONTRACT, INVOICE, DocumentPipeline, BytesSink
+    from core.output_store import OutputStore
+    from core.template_cache import template_cache
+
+    def cold_compile():
+        template_cache.clear()
+        template_cache.get(template)
+
+    # Without the on-disk cache the template is parsed and compiled, with it the compiled code is loaded
+    folder, template_cache.folder = template_cache.folder, None
+    results.add("render.compile_template", time_ms(cold_compile), "ms")
+    template_cache.folder = work / "template-cache"
+    cold_compile()
+    results.add("render.load_compiled_template", time_ms(cold_compile), "ms")
+    template_cache.folder = folder
+
+    pipeline = DocumentPipeline(CONTRACT, [BytesSink()])
+    values = pipeline.build_values(FIELDS)
+    results.add("render.in_memory", time_ms(lambda: pipeline.render_and_write(template, values)), "ms")
+
+    # Full generation as done by the forms: render, save and record
+    for document_type in (CONTRACT, INVOICE):
+        folder = work / document_type.name
+        folder.mkdir()
+        generator = DocumentPipeline(document_type, store=OutputStore(folder))
+        started = time.perf_counter()
+        for fields in make_field_rows(documents):
+            generator.generate(template, fields)
+        elapsed = time.perf_counter() - started
+        results.add(f"generate.{document_type.name}.throughput", documents / elapsed, "docs/s", "higher")
+
+    # Same values again: found in the output store, nothing is rendered
+    results.add("generate.contract.already_generated", time_ms(lambda: generator.generate(template, FIELDS)), "ms")
+
+
+def bench_preview(results, work, template):
+    from core.pipeline import CONTRACT, DocumentPipeline, FolderSink
+    from core.preview import docx_to_html, preview_cache
+    from core.live_preview import get_live_preview
+
+    document = DocumentPipeline(CONTRACT, [FolderSink(work)]).generate(template, FIELDS)
+    results.add("preview.template_html", time_ms(lambda: docx_to_html(template)), "ms")
+    results.add("preview.document_html", time_ms(lambda: docx_to_html(document.path)), "ms")
+    preview_cache.get_html(document.path)
+    results.add("preview.document_html_cached", time_ms(lambda: preview_cache.get_html(document.path)), "ms")
+
+    values = CONTRACT.build_values(FIELDS)
+    live_preview = get_live_preview(template)
+    results.add("preview.live_first_render", time_ms(lambda: (setattr(live_preview, "_values", None),
+                                                                  live_preview.render(values)), repeat=3), "ms")
+    amounts = iter(range(10 ** 6))
+    results.add("preview.live_one_field_changed",
+                time_ms(lambda: live_preview.render(dict(values, LINE2=f"Programme {next(amounts)}"))), "ms")
+
+
+def bench_dashboard(results, work, sizes):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from ui.home import HomeTab
+    from ui.accounts import AccountsTab
+
+    for size in sizes:
+        use_database(work / f"contracts-{size}.db")
+        rows = make_rows(size)
+        started = time.perf_counter()
+        for start in range(0, size, 10000):
+            database.insert_many(rows[start:start + 10000])
+        print(f"  (database of {size} contracts built in {time.perf_counter() - started:.1f} s)", flush=True)
+
+        home_tab = HomeTab()
+
+        def refresh_home():
+            # The view fetches the first page on the next paint, count it in
+            home_tab.update_home_tab()
+            home_tab.recent_contracts_model.fetchMore()
+        results.add(f"dashboard.home_refresh.{size}", time_ms(refresh_home), "ms")
+        from data.rollups import rebuild_rollups
+        results.add(f"dashboard.rollup_rebuild.{size}", time_ms(rebuild_rollups, repeat=1), "ms")
+        record = (database.insert_contract(*rows[0]), *rows[0])
+        results.add(f"dashboard.home_add_contract.{size}", time_ms(lambda: home_tab.add_contract(record)), "ms")
+
+        accounts_tab = AccountsTab()
+        accounts_tab.show()
+
+        def refresh_accounts():
+            accounts_tab.update_balances()
+            accounts_tab.entries_model.reload()
+            app.processEvents()
+        results.add(f"dashboard.accounts_refresh.{size}", time_ms(refresh_accounts), "ms")
+        accounts_tab.close()
+        home_tab.deleteLater()
+        accounts_tab.deleteLater()
+        app.processEvents()
+
+
+def bench_batch(results, work, template, rows, worker_counts):
+    from core.batch import generate_batch
+    use_database(work / "batch.db")
+    for workers in worker_counts:
+        folder = work / f"batch-{workers}"
+        folder.mkdir()
+        started = time.perf_counter()
+        result = generate_batch(template, make_field_rows(rows), folder, workers=workers)
+        elapsed = time.perf_counter() - started
+        if result.errors:
+            raise RuntimeError(f"Batch failed: {result.errors[:3]}")
+        results.add(f"batch.workers_{workers}.throughput", rows / elapsed, "docs/s", "higher")
+
+    # Re-running the last batch only looks the documents up in the output store
+    started = time.perf_counter()
+    generate_batch(template, make_field_rows(rows), folder, workers=worker_counts[-1])
+    results.add("batch.rerun.throughput", rows / (time.perf_counter() - started), "docs/s", "higher")
+
+
+def bench_pdf(results, work, documents):
+    from core.pdf_converter import find_soffice, get_converter
+    from core.pdf_export import export_pdfs
+    from core.simple_pdf import fpdf_available
+    sources = [path for path in (work / "contract").glob("*.docx")][:documents]
+    if fpdf_available():
+        result = export_pdfs(sources, work / "pdf-fast", engine="fpdf")
+        results.add("pdf.fast.throughput", result.throughput, "docs/s", "higher")
+    if not find_soffice():
+        print("  (LibreOffice not found, LibreOffice PDF export skipped)", flush=True)
+        return
+
+    output_folder = work / "pdf"
+    output_folder.mkdir()
+    converter = get_converter()
+    converter.convert(sources[0], output_folder).result()  # start the workers
+    started = time.perf_counter()
+    for future in [converter.convert(source, output_folder) for source in sources]:
+        future.result()
+    results.add("pdf.throughput", len(sources) / (time.perf_counter() - started), "docs/s", "higher")
+    converter.shutdown()
+
+
+def compare(metrics, baseline, threshold):
+    """
+    Print the change of every metric against the baseline and return the names of the regressions.
+    """
+    regressions = []
+    print(f"\nComparison against the baseline (threshold {threshold:.0%}):")
+    for name, metric in metrics.items():
+        reference = baseline.get(name)
+        if not reference or not reference["value"]:
+            print(f"  {name:<45} {'new':>12}")
+            continue
+        change = (metric["value"] - reference["value"]) / reference["value"]
+        slower = change > threshold if metric["better"] == "lower" else change < -threshold
+        if slower:
+            regressions.append(name)
+        print(f"  {name:<45} {change:+11.1%}{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the headless benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="smaller databases and fewer documents")
+    parser.add_argument("--sizes", help="comma separated database sizes (default: 1000,10000,100000)")
+    parser.add_argument("--documents", type=int, help="documents generated per throughput measurement")
+    parser.add_argument("--workers", help="comma separated worker counts of the batch benchmark")
+    parser.add_argument("--only", help="comma separated benchmarks: render,preview,dashboard,batch,pdf")
+    parser.add_argument("--output", default=str(BENCHMARKS_FOLDER / "results.json"), help="results file")
+    parser.add_argument("--baseline", default=str(BENCHMARKS_FOLDER / "baseline.json"), help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")] if args.sizes else (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    documents = args.documents or (20 if args.quick else 100)
+    cpu_count = os.cpu_count() or 1
+    worker_counts = ([int(count) for count in args.workers.split(",")] if args.workers
+                     else sorted({1, 2, 4, cpu_count} if cpu_count > 1 else {1}))
+    only = set(args.only.split(",")) if args.only else {"render", "preview", "dashboard", "batch", "pdf"}
+
+    results = Results()
+    work = Path(tempfile.mkdtemp(prefix="contract-bench-"))
+    try:
+        template = make_template(work / "template.docx")
+        use_database(work / "generate.db")
+        if "render" in only or "pdf" in only:
+            print("Render", flush=True)
+            bench_render(results, work, template, documents)
+        if "preview" in only:
+            print("Preview", flush=True)
+            bench_preview(results, work, template)
+        if "dashboard" in only:
+            print("Dashboard", flush=True)
+            bench_dashboard(results, work, sizes)
+        if "batch" in only:
+            print("Batch", flush=True)
+            bench_batch(results, work, template, documents * 2, worker_counts)
+        if "pdf" in only:
+            print("PDF export", flush=True)
+            bench_pdf(results, work, documents)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": cpu_count,
+            "sizes": list(sizes),
+            "documents": documents,
+        },
+        "metrics": results.metrics,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print("No baseline to compare with, run with --save-baseline to store one.")
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())["metrics"]
+    return 1 if compare(results.metrics, baseline, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Stress test of parallel generation: many documents rendered at once from one
+template, by threads sharing a pipeline and by the batch process pool, then
+every output file and database row is checked against its own inputs.
+
+    python -m benchmarks.stress_render                  # 200 documents, 8 threads, 4 processes
+    python -m benchmarks.stress_render -n 1000 --threads 16 --processes 8
+
+Runs in a temporary folder with its own database; the exit status is 1 when
+any document holds another document's values, a file is missing or partial,
+or a temporary file was left behind.
+"""
+import sys
+import uuid
+import shutil
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import data.database as database
+from benchmarks.fixtures import make_template, use_database
+
+
+def make_fields(count, prefix):
+    """
+    Return count field dicts whose client, vendor and amount are unique to each document.
+    """
+    token = uuid.uuid4().hex[:8]
+    return [
+        {
+            "CLIENT": f"Client {prefix}{number} {token}",
+            "VENDOR": f"Vendor {prefix}{number} {token}",
+            "AMOUNT": str(1000 + number * 7),
+            "LINE1": f"Line one of {prefix}{number}",
+            "LINE2": f"Line two of {prefix}{number}",
+        }
+        for number in range(count)
+    ]
+
+
+def check_document(path, fields, record, errors):
+    from core.preview import docx_to_text
+    name = f"{fields['VENDOR']} ({Path(path).name})"
+    try:
+        text = docx_to_text(path)
+    except Exception as e:
+        errors.append(f"{name}: unreadable ({e})")
+        return
+    for key in ("CLIENT", "VENDOR", "AMOUNT", "LINE1"):
+        if fields[key] not in text:
+            errors.append(f"{name}: {key} {fields[key]!r} not in the document")
+    if record is None:
+        errors.append(f"{name}: not recorded")
+        return
+    stored = database_row(record[0])
+    expected = (fields["CLIENT"], fields["VENDOR"], fields["AMOUNT"], fields["LINE1"], fields["LINE2"])
+    if stored is None or tuple(stored[1:6]) != expected:
+        errors.append(f"{name}: database row {stored} does not match the inputs")
+
+
+def database_row(contract_id):
+    with database.get_connection() as conn:
+        return conn.execute("SELECT * FROM contracts WHERE id = ?", (contract_id,)).fetchone()
+
+
+def check_leftovers(folder, errors):
+    for path in Path(folder).iterdir():
+        if path.name.endswith(".part"):
+            errors.append(f"temporary file left behind: {path.name}")
+
+
+def run_threads(template, folder, count, threads):
+    """
+    Render count documents from one shared pipeline on a thread pool.
+    """
+    from core.pipeline import CONTRACT, DocumentPipeline
+    from core.output_store import OutputStore
+    pipeline = DocumentPipeline(CONTRACT, store=OutputStore(folder))
+    rows = make_fields(count, "t")
+    errors = []
+    start = threading.Barrier(threads)
+
+    def generate(fields):
+        return fields, pipeline.generate(template, fields)
+
+    def warm_up(_):
+        # Start every thread together so the first renders really overlap
+        start.wait()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(warm_up, range(threads)))
+        results = list(executor.map(generate, rows))
+    for fields, document in results:
+        check_document(document.path, fields, document.record, errors)
+    check_leftovers(folder, errors)
+    return errors
+
+
+def run_same_target(template, folder, count, threads):
+    """
+    Save count different documents under the same file name at once: the file
+    left at the end must be complete and hold the values of one of them.
+    """
+    from core.pipeline import CONTRACT, DocumentPipeline, FolderSink
+    from core.preview import docx_to_text
+    pipeline = DocumentPipeline(CONTRACT, [FolderSink(folder)])
+    rows = make_fields(count, "s")
+    for fields in rows:
+        fields["VENDOR"] = "Shared vendor"
+    errors = []
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        paths = {document.path for document in executor.map(lambda fields: pipeline.generate(template, fields), rows)}
+    if len(paths) != 1:
+        errors.append(f"expected one shared file, got {len(paths)}")
+    for path in paths:
+        try:
+            text = docx_to_text(path)
+        except Exception as e:
+            errors.append(f"{Path(path).name}: unreadable ({e})")
+            continue
+        if sum(fields["CLIENT"] in text for fields in rows) != 1:
+            errors.append(f"{Path(path).name}: does not hold the values of exactly one document")
+    check_leftovers(folder, errors)
+    return errors
+
+
+def run_processes(template, folder, count, processes):
+    """
+    Render count documents with the batch process pool.
+    """
+    from core.batch import generate_batch
+    rows = make_fields(count, "p")
+    result = generate_batch(template, rows, folder, workers=processes)
+    errors = [f"row {number}: {message}" for number, message in result.errors]
+    if len(result.records) != count:
+        errors.append(f"{len(result.records)} of {count} documents recorded")
+    for (number, _, path), record in zip(result.generated, result.records):
+        check_document(path, rows[number - 1], record, errors)
+    check_leftovers(folder, errors)
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--count", type=int, default=200, help="documents per run")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--keep", action="store_true", help="keep the temporary folder")
+    args = parser.parse_args(argv)
+
+    work = Path(tempfile.mkdtemp(prefix="contract-stress-"))
+    use_database(work / "contracts.db")
+    template = make_template(work / "template.docx", paragraphs=20)
+    failed = False
+    try:
+        for name, run, folder, parallelism in (
+            (f"threads x{args.threads}", run_threads, work / "threads", args.threads),
+            (f"same file x{args.threads}", run_same_target, work / "same", args.threads),
+            (f"processes x{args.processes}", run_processes, work / "processes", args.processes),
+        ):
+            folder.mkdir()
+            errors = run(template, folder, args.count, parallelism)
+            print(f"{name:<20} {args.count} documents: {'FAIL' if errors else 'ok'}")
+            for error in errors[:20]:
+                print(f"    {error}")
+            failed = failed or bool(errors)
+    finally:
+        if args.keep:
+            print(f"Files kept in {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
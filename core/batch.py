@@ -0,0 +1,146 @@
+import os
+import csv
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import data.database as database
+from core.pipeline import DocumentPipeline, StoreSink, record_row
+from core.output_store import OutputStore
+from core.tracing import tracer
+
+
+class BatchResult:
+    """
+    Outcome of a batch run: generated documents and per-row errors.
+    Row numbers are 1-based data rows, not counting the header line.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.generated = []  # (row number, values, output path)
+        self.errors = []  # (row number, message)
+        self.records = []  # inserted database rows
+        self.reused = []  # row numbers of documents already produced by an earlier run
+        self.cancelled = False
+
+
+_pipelines = {}  # (output folder, document type) -> pipeline, one set per worker process
+
+
+def read_rows(path):
+    """
+    Read the rows of a CSV or XLSX file as dicts keyed by the header line.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".xlsx":
+        return _read_xlsx_rows(path)
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        return [_clean_row(row) for row in csv.DictReader(f, dialect=dialect)]
+
+
+def _read_xlsx_rows(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Reading .xlsx files requires the 'openpyxl' package.")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        return [
+            _clean_row(dict(zip(header, row)))
+            for row in rows
+            if any(cell is not None for cell in row)
+        ]
+    finally:
+        workbook.close()
+
+
+def _clean_row(row):
+    return {
+        str(key).strip().upper(): "" if value is None else str(value).strip()
+        for key, value in row.items()
+        if key
+    }
+
+
+def render_row(template_path, output_folder, fields, document_type="contract"):
+    """
+    Render one document from a row of fields and save it to the output store of output_folder,
+    unless the same document is already there. Returns (values, path, store entry, reused).
+    Runs inside the worker processes, each of which keeps its own template cache.
+    """
+    key = (str(output_folder), document_type)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        # The entries are added by the parent process once the rows are recorded
+        store = OutputStore(output_folder)
+        pipeline = _pipelines[key] = DocumentPipeline(document_type, [StoreSink(store)], store=store,
+                                                      add_to_store=False)
+    document = pipeline.generate(template_path, fields)
+    return document.values, document.path, pipeline.store.entry(document), document.reused
+
+
+@tracer.traced("batch")
+def generate_batch(template_path, rows, output_folder, workers=None, progress=None, should_stop=None,
+                   document_type="contract"):
+    """
+    Render one document per row in a process pool and insert every generated
+    document into the database in a single transaction at the end.
+    Documents already produced from the same template and values by an earlier
+    run are neither rendered nor recorded again, so a batch can safely be re-run.
+    progress, if given, is called as progress(done, total) after each row.
+    should_stop, if given, is polled after each row; when it returns True the
+    remaining rows are dropped and the contracts already written are kept.
+    """
+    result = BatchResult(len(rows))
+    entries = {}  # row number -> store entry of a new document
+    workers = workers or os.cpu_count() or 1
+
+    # Spawned rather than forked: batches are started from a worker thread of the GUI, and a forked
+    # child would inherit whatever locks the other threads hold at that moment, such as the template cache's
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(rows), 1)),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(render_row, template_path, output_folder, row, document_type): number
+            for number, row in enumerate(rows, start=1)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            number = futures[future]
+            try:
+                values, output_path, entry, reused = future.result()
+                result.generated.append((number, values, output_path))
+                if reused and entry["record"]:
+                    result.reused.append(number)
+                else:
+                    entries[number] = entry
+            except Exception as e:
+                result.errors.append((number, str(e)))
+            if progress:
+                progress(done, result.total)
+            if should_stop and should_stop():
+                result.cancelled = True
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    result.generated.sort(key=lambda item: item[0])
+    result.errors.sort()
+    result.reused.sort()
+    new = [item for item in result.generated if item[0] in entries]
+    result.records = database.insert_many(
+        [record_row(values) for _, values, _ in new], kind=document_type,
+        paths=[output_path for _, _, output_path in new])
+
+    store = OutputStore(output_folder)
+    for (number, _, _), record in zip(new, result.records):
+        store.add(dict(entries[number], record=list(record)))
+    return result
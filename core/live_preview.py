@@ -0,0 +1,90 @@
+import io
+import threading
+from jinja2 import Environment, meta, TemplateSyntaxError
+from lxml import etree
+from core.preview import PAGE_STYLE, HEADER_TYPE, part_to_html
+from core.template_cache import template_cache
+from core.tracing import tracer
+
+# Values are escaped because the blocks are rendered as XML before being converted to HTML
+_environment = Environment(autoescape=True)
+
+
+class PreviewBlock:
+    """
+    One top-level paragraph or table of a template, compiled on its own with
+    the set of variables it uses and the HTML of its last render.
+    """
+
+    def __init__(self, source, wrapper=None):
+        self.template = _environment.from_string(source)
+        self.variables = meta.find_undeclared_variables(_environment.parse(source))
+        self.wrapper = wrapper
+        self.html = None
+
+    def render(self, values):
+        xml = self.template.render(values)
+        html = part_to_html(io.BytesIO(xml.encode("utf-8")))
+        if self.wrapper:
+            html = f'<div class="{self.wrapper}">{html}</div>'
+        self.html = html
+
+
+class LivePreview:
+    """
+    In-memory HTML rendering of a compiled template for the live preview.
+    Nothing is written to disk. After the first render, only the blocks that
+    use a changed value are rendered again.
+    """
+
+    def __init__(self, compiled):
+        self._lock = threading.Lock()
+        self._values = None
+        headers, footers = [], []
+        for uri, xml in compiled.part_xml.values():
+            block = PreviewBlock(xml, "header" if uri == HEADER_TYPE else "footer")
+            (headers if uri == HEADER_TYPE else footers).append(block)
+        self.blocks = headers + self._body_blocks(compiled.body_xml) + footers
+
+    @staticmethod
+    def _body_blocks(body_xml):
+        body = etree.fromstring(body_xml, etree.XMLParser(recover=True, huge_tree=True))
+        if body is None:
+            return [PreviewBlock(body_xml)]
+        # Block-level tags such as {%p if %} or {%tr for %} leave Jinja text between
+        # elements; such templates can only be rendered as a whole
+        texts = [body.text] + [child.tail for child in body]
+        if any(text and text.strip() for text in texts):
+            return [PreviewBlock(body_xml)]
+        try:
+            return [PreviewBlock(etree.tostring(child, encoding="unicode")) for child in body]
+        except TemplateSyntaxError:
+            # A control structure spans several paragraphs
+            return [PreviewBlock(body_xml)]
+
+    @tracer.traced("preview.live")
+    def render(self, values):
+        """
+        Return the preview HTML for the given values.
+        """
+        with self._lock:
+            if self._values is None:
+                changed = None
+            else:
+                keys = set(values) | set(self._values)
+                changed = {key for key in keys if values.get(key) != self._values.get(key)}
+            for block in self.blocks:
+                if block.html is None or changed is None or block.variables & changed:
+                    block.render(values)
+            self._values = dict(values)
+            return PAGE_STYLE + "".join(block.html for block in self.blocks)
+
+
+def get_live_preview(path):
+    """
+    Return the LivePreview of a template, sharing the template cache entry.
+    """
+    compiled = template_cache.get(path)
+    if compiled.live_preview is None:
+        compiled.live_preview = LivePreview(compiled)
+    return compiled.live_preview
@@ -0,0 +1,177 @@
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+INDEX_NAME = "index.jsonl"
+
+_template_digests = {}  # (path, mtime_ns, size) -> sha256 of the template file
+_template_digests_lock = threading.Lock()
+
+
+def template_digest(path):
+    """
+    Return the sha256 of a template file, re-hashing it only when its mtime or size changed.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _template_digests_lock:
+        digest = _template_digests.get(key)
+    if digest is None:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        with _template_digests_lock:
+            _template_digests[key] = digest
+    return digest
+
+
+def safe_filename(name):
+    """
+    Replace the characters that cannot appear in a file name, such as path separators.
+    """
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", name).strip(" .") or "document"
+
+
+# mkstemp creates files only their owner can read, the files written here get the usual permissions
+_umask = os.umask(0o022)
+os.umask(_umask)
+
+
+def temporary_file(path):
+    """
+    Create a unique temporary file next to path, to be renamed over it once
+    complete, and return its (descriptor, path).
+    """
+    descriptor, temporary = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".part", dir=path.parent)
+    os.chmod(temporary, 0o666 & ~_umask)
+    return descriptor, temporary
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to a unique temporary file next to path, then rename it over path,
+    so concurrent writers and readers never see a partial file.
+    The temporary file is removed if anything fails.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = temporary_file(path)
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+class OutputStore:
+    """
+    Content-addressed store of generated documents in one folder.
+    A document ID is derived from the document type, the template content and
+    the values, so the same inputs always give the same ID and are rendered once.
+    Files are named {name}-{ID}-{content hash}.docx, so documents of the same
+    vendor never overwrite each other, and are written to a temporary file then
+    renamed. index.jsonl maps IDs to files and database records; it is only
+    appended to, one JSON line per document, so several processes can share it.
+    """
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.index_path = self.folder / INDEX_NAME
+        self.entries = {}  # document ID -> index entry
+        self._offset = 0  # bytes of the index already read
+        self._lock = threading.Lock()
+
+    def document_id(self, document_type, template_path, values):
+        source = json.dumps(
+            [document_type.name, template_digest(template_path), values],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()[:24]
+
+    def _refresh(self):
+        # Read the lines appended since the last call, by this process or another one
+        try:
+            size = self.index_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being appended by another process is read next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.entries[entry["id"]] = entry
+        self._offset += end
+
+    def get(self, document_id):
+        """
+        Return the index entry of a document whose file still exists, or None.
+        """
+        with self._lock:
+            self._refresh()
+            entry = self.entries.get(document_id)
+        if entry is None or not (self.folder / entry["file"]).is_file():
+            return None
+        return entry
+
+    def path(self, entry):
+        return self.folder / entry["file"]
+
+    def write(self, document):
+        """
+        Save a rendered document atomically under its content-addressed name
+        and set document.path and document.content_hash.
+        """
+        buffer = io.BytesIO()
+        document.doc.save(buffer)
+        data = buffer.getvalue()
+        document.content_hash = hashlib.sha256(data).hexdigest()
+
+        stem, suffix = os.path.splitext(safe_filename(document.filename))
+        name = f"{stem}-{document.document_id[:12]}-{document.content_hash[:8]}{suffix or '.docx'}"
+        write_atomic(self.folder / name, data)
+        document.path = self.folder / name
+
+    def entry(self, document):
+        return {
+            "id": document.document_id,
+            "type": document.document_type.name,
+            "file": Path(document.path).name,
+            "sha256": document.content_hash,
+            "record": list(document.record) if document.record else None,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def add(self, entry):
+        """
+        Append an index entry, as returned by entry().
+        """
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            # One write call in append mode, so lines of concurrent writers do not interleave
+            descriptor = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(descriptor, line)
+            finally:
+                os.close(descriptor)
+            self.entries[entry["id"]] = entry
@@ -0,0 +1,67 @@
+import os
+import sys
+from pathlib import Path
+
+
+# Overrides the folder of the caches kept between runs, such as compiled templates
+CACHE_FOLDER_ENV_VAR = "CONTRACT_CACHE_DIR"
+# Overrides the folder of the user's data, such as the contracts database
+DATA_FOLDER_ENV_VAR = "CONTRACT_DATA_DIR"
+
+
+def get_downloads_folder():
+    """
+    Return the user's Downloads directory for the current platform.
+    """
+    if sys.platform == "win32":
+        return Path(os.getenv('USERPROFILE')) / 'Downloads'
+    elif sys.platform == "darwin":
+        return Path.home() / 'Downloads'
+    else:  # Linux and other Unix-like OS
+        return Path.home() / 'Téléchargements'
+
+
+def get_contract_folder():
+    """
+    Return the 'nouveau_contrat' output folder, creating it if it doesn't exist.
+    """
+    folder = get_downloads_folder() / 'nouveau_contrat'
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def get_facture_folder():
+    """
+    Return the 'Facture_new' output folder, creating it if it doesn't exist.
+    """
+    folder = get_downloads_folder() / 'Facture_new'
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def get_cache_folder():
+    """
+    Return the folder for the caches kept between runs. It is created when first written to.
+    """
+    if os.getenv(CACHE_FOLDER_ENV_VAR):
+        return Path(os.getenv(CACHE_FOLDER_ENV_VAR))
+    if sys.platform == "win32":
+        return Path(os.getenv('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local') / 'contract_generator' / 'cache'
+    elif sys.platform == "darwin":
+        return Path.home() / 'Library' / 'Caches' / 'contract_generator'
+    else:  # Linux and other Unix-like OS
+        return Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'contract_generator'
+
+
+def get_data_folder():
+    """
+    Return the folder for the user's data, such as the contracts database. It is created when first written to.
+    """
+    if os.getenv(DATA_FOLDER_ENV_VAR):
+        return Path(os.getenv(DATA_FOLDER_ENV_VAR))
+    if sys.platform == "win32":
+        return Path(os.getenv('APPDATA') or Path.home() / 'AppData' / 'Roaming') / 'contract_generator'
+    elif sys.platform == "darwin":
+        return Path.home() / 'Library' / 'Application Support' / 'contract_generator'
+    else:  # Linux and other Unix-like OS
+        return Path(os.getenv('XDG_DATA_HOME') or Path.home() / '.local' / 'share') / 'contract_generator'
@@ -0,0 +1,387 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import shutil
+import tempfile
+import threading
+import subprocess
+import functools
+from pathlib import Path
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from core import soffice_bridge
+from core.tracing import tracer
+
+# Number of warm LibreOffice instances kept by the shared converter
+def _workers_from_env(default=2):
+    try:
+        return max(int(os.getenv("PDF_CONVERTER_WORKERS", default)), 1)
+    except ValueError:
+        return default
+
+
+DEFAULT_WORKERS = _workers_from_env()
+START_TIMEOUT = 60
+
+
+def find_soffice():
+    """
+    Return the path of the LibreOffice executable, or None if it is not installed.
+    """
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    if sys.platform == "darwin":
+        path = Path("/Applications/LibreOffice.app/Contents/MacOS/soffice")
+        if path.exists():
+            return str(path)
+    return None
+
+
+def uno_available():
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _uno_env(soffice):
+    # uno.py lives in LibreOffice's program folder on the installs that bundle their Python
+    program = str(Path(soffice).resolve().parent)
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [program, os.getenv("PYTHONPATH")])))
+
+
+@functools.lru_cache(maxsize=None)
+def find_uno_python(soffice):
+    """
+    Return a Python interpreter that can import uno, preferably the one bundled
+    with LibreOffice, or None. Used when the application's Python cannot.
+    """
+    program = Path(soffice).resolve().parent
+    candidates = [program / "python.exe", program / "python", program.parent / "Resources" / "python",
+                  Path(sys.executable), shutil.which("python3")]
+    env = _uno_env(soffice)
+    for candidate in candidates:
+        if not candidate or not Path(candidate).is_file():
+            continue
+        try:
+            result = subprocess.run([str(candidate), "-c", "import uno"], env=env, capture_output=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            return str(candidate)
+    return None
+
+
+class OfficeWorker:
+    """
+    One warm headless LibreOffice instance with its own user profile, driven over UNO.
+    """
+
+    def __init__(self, soffice, index):
+        self.soffice = soffice
+        self.profile_dir = Path(tempfile.gettempdir()) / f"contract-soffice-{os.getpid()}-{index}"
+        self.pipe_name = f"contract_soffice_{os.getpid()}_{index}"
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        self.process = subprocess.Popen([
+            self.soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+            f"-env:UserInstallation={self.profile_dir.as_uri()}",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.desktop = self._connect()
+
+    def _connect(self):
+        return soffice_bridge.connect(self.pipe_name, START_TIMEOUT, lambda: self.process.poll() is None)
+
+    def is_alive(self):
+        return self.desktop is not None and self.process is not None and self.process.poll() is None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def convert(self, source, target):
+        soffice_bridge.convert(self.desktop, source, target)
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+
+class BridgeWorker(OfficeWorker):
+    """
+    Warm LibreOffice instance for when the application's Python cannot import uno:
+    the UNO calls are made by core/soffice_bridge.py running on a Python that can,
+    usually LibreOffice's own, which is sent the conversions over its stdin.
+    """
+
+    def __init__(self, soffice, index, python):
+        super().__init__(soffice, index)
+        self.python = python
+        self.bridge = None
+
+    def _connect(self):
+        self.bridge = subprocess.Popen(
+            [self.python, soffice_bridge.__file__, self.pipe_name, str(START_TIMEOUT)], env=_uno_env(self.soffice),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8")
+        self._receive()
+        return self.bridge
+
+    def _receive(self):
+        line = self.bridge.stdout.readline()
+        if not line:
+            raise RuntimeError("The LibreOffice bridge stopped")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+
+    def is_alive(self):
+        return super().is_alive() and self.bridge.poll() is None
+
+    def convert(self, source, target):
+        self.bridge.stdin.write(json.dumps({"source": str(source), "target": str(target)}) + "\n")
+        self.bridge.stdin.flush()
+        self._receive()
+
+    def stop(self):
+        if self.bridge is not None:
+            # Closing its stdin makes the bridge terminate LibreOffice and exit
+            try:
+                self.bridge.stdin.close()
+                self.bridge.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.bridge.kill()
+            self.bridge = None
+        self.desktop = None
+        super().stop()
+
+
+class CommandLineWorker:
+    """
+    Last fallback, when no Python can import uno: one soffice run per
+    document, but with a private profile so parallel conversions don't clash.
+    """
+
+    def __init__(self, soffice, index):
+        self.soffice = soffice
+        self.profile_dir = Path(tempfile.gettempdir()) / f"contract-soffice-{os.getpid()}-{index}"
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def restart(self):
+        pass
+
+    def convert(self, source, target):
+        with tempfile.TemporaryDirectory() as outdir:
+            result = subprocess.run([
+                self.soffice, "--headless", "--norestore", f"-env:UserInstallation={self.profile_dir.as_uri()}",
+                "--convert-to", "pdf", "--outdir", outdir, str(source),
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            produced = Path(outdir) / f"{Path(source).stem}.pdf"
+            if result.returncode != 0 or not produced.exists():
+                message = result.stderr.decode(errors="replace").strip()
+                raise RuntimeError(message or f"LibreOffice exited with status {result.returncode}")
+            shutil.move(str(produced), str(target))
+
+    def stop(self):
+        pass
+
+
+class ConverterService:
+    """
+    Queue of DOCX to PDF conversions served by N LibreOffice workers, each on its own thread.
+    Workers are started lazily and restarted when their soffice process has died.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, soffice=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice is not installed.")
+        if uno_available():
+            worker_class = OfficeWorker
+        elif find_uno_python(self.soffice):
+            worker_class = functools.partial(BridgeWorker, python=find_uno_python(self.soffice))
+        else:
+            worker_class = CommandLineWorker
+        self.workers = [worker_class(self.soffice, index) for index in range(max(workers, 1))]
+        self.requests = queue.Queue()
+        self.threads = []
+        for worker in self.workers:
+            thread = threading.Thread(target=self._serve, args=(worker,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _serve(self, worker):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                worker.stop()
+                shutil.rmtree(worker.profile_dir, ignore_errors=True)
+                return
+            future, source, target = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._convert_with(worker, source, target))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _convert_with(self, worker, source, target):
+        # Write next to the target and rename, so readers never see a partial PDF.
+        # The name is unique to this worker, so two conversions to the same target don't clash.
+        partial = target.with_name(f".{target.name}.{os.getpid()}-{threading.get_ident()}.part")
+        for attempt in range(2):
+            try:
+                if not worker.is_alive():
+                    worker.restart()
+                worker.convert(source, partial)
+                os.replace(partial, target)
+                return target
+            except Exception:
+                partial.unlink(missing_ok=True)
+                # Retry once on a fresh instance if soffice crashed under us
+                if attempt == 0 and not worker.is_alive():
+                    continue
+                raise
+
+    def convert(self, source, output_folder=None):
+        """
+        Queue the conversion of a .docx file and return a Future resolving to the PDF path.
+        """
+        source = Path(source).resolve()
+        output_folder = Path(output_folder) if output_folder else source.parent
+        future = Future()
+        self.requests.put((future, source, output_folder / f"{source.stem}.pdf"))
+        return future
+
+    def convert_folder(self, folder, output_folder=None, progress=None, should_stop=None):
+        """
+        Convert every .docx file of a folder, spread across the workers.
+        Returns a list of (source, pdf path or None, error message or None).
+        should_stop, if given, is polled after each document; once it returns True the
+        documents not started yet are dropped from the results, those already being
+        converted are still waited for.
+        """
+        sources = sorted(p for p in Path(folder).glob("*.docx") if not p.name.startswith("~$"))
+        futures = [(source, self.convert(source, output_folder)) for source in sources]
+        results = []
+        stopped = False
+        for done, (source, future) in enumerate(futures, start=1):
+            if not stopped and should_stop and should_stop():
+                stopped = True
+                for _, pending in futures:
+                    pending.cancel()
+            if future.cancelled():
+                continue
+            try:
+                results.append((source, future.result(), None))
+            except Exception as e:
+                results.append((source, None, str(e) or type(e).__name__))
+            if progress:
+                progress(done, len(futures))
+        return results
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.requests.put(None)
+        for thread in self.threads:
+            thread.join(timeout=10)
+
+
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter():
+    """
+    Return the shared converter service, starting it on first use.
+    """
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = ConverterService()
+            atexit.register(_converter.shutdown)
+        return _converter
+
+
+@tracer.traced("pdf.convert")
+def convert_to_pdf(docx_path, output_folder, should_stop=None):
+    """
+    Convert a Word document to PDF in output_folder and return the PDF path.
+    """
+    pdf_path = Path(output_folder) / f"{Path(docx_path).stem}.pdf"
+
+    # Using Word to PDF conversion for accuracy
+    if sys.platform == "win32":
+        # For Windows, you can use Microsoft Word COM object
+        import comtypes.client
+
+        # COM must be initialised on every thread that uses it
+        comtypes.CoInitialize()
+        try:
+            # Initialize Word application
+            word = comtypes.client.CreateObject('Word.Application')
+            doc = word.Documents.Open(str(docx_path))
+
+            # Export as PDF
+            doc.SaveAs(str(pdf_path), FileFormat=17)  # 17 corresponds to wdFormatPDF
+
+            # Close the document and Word application
+            doc.Close()
+            word.Quit()
+        finally:
+            comtypes.CoUninitialize()
+        return pdf_path
+
+    # On macOS and Linux, hand the document to the warm LibreOffice workers
+    future = get_converter().convert(docx_path, output_folder)
+    while True:
+        try:
+            return future.result(timeout=0.2)
+        except FutureTimeoutError:
+            if should_stop and should_stop() and future.cancel():
+                return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert every .docx file of a folder to PDF.")
+    parser.add_argument("folder", help="Folder containing the .docx files")
+    parser.add_argument("--output", help="Output folder (default: same folder)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of LibreOffice instances")
+    args = parser.parse_args()
+
+    service = ConverterService(workers=args.workers)
+    try:
+        results = service.convert_folder(
+            args.folder, args.output,
+            progress=lambda done, total: print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True))
+    finally:
+        service.shutdown()
+    print(file=sys.stderr)
+    for source, _, error in results:
+        if error:
+            print(f"{source.name}: {error}", file=sys.stderr)
+    print(f"{sum(1 for _, pdf, _ in results if pdf)} of {len(results)} documents converted")
+    sys.exit(1 if any(error for _, _, error in results) else 0)
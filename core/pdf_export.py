@@ -0,0 +1,157 @@
+import os
+import time
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.tracing import tracer
+
+# LibreOffice renders the documents as Word does and is the default; fpdf is a faster
+# pure-Python renderer for simple documents whose layout is only approximate, and auto
+# uses it for the simple documents and LibreOffice for the others
+ENGINES = ("libreoffice", "auto", "fpdf")
+
+
+class PdfExportResult:
+    """
+    Outcome of a bulk PDF export. converted, skipped and errors list
+    (source, PDF path or error message); fast counts the documents rendered
+    without LibreOffice.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.converted = []  # (source, pdf path)
+        self.skipped = []  # (source, pdf path) already up to date
+        self.errors = []  # (source, message)
+        self.fast = 0
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        return len(self.converted) / self.elapsed if self.elapsed else 0.0
+
+
+def find_documents(folder):
+    """
+    Return the .docx files of a folder, without Word lock files.
+    """
+    return sorted(path for path in Path(folder).glob("*.docx") if not path.name.startswith("~$"))
+
+
+def _target(source, output_folder):
+    return (Path(output_folder) if output_folder else source.parent) / f"{source.stem}.pdf"
+
+
+def _up_to_date(source, target):
+    try:
+        return target.stat().st_mtime_ns >= source.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def render_fast(source, target):
+    # Runs in the worker processes
+    from core.simple_pdf import render_pdf
+    return render_pdf(source, target)
+
+
+@tracer.traced("pdf.export")
+def export_pdfs(sources, output_folder=None, workers=None, engine="libreoffice", force=False,
+                progress=None, should_stop=None):
+    """
+    Convert many .docx files to PDF, next to each file or in output_folder,
+    on a pool of warm LibreOffice instances. Only when the fpdf or auto engine
+    is asked for, simple documents are rendered by a pool of worker processes
+    without LibreOffice; workers sets the size of both pools. PDFs newer than
+    their document are kept unless force is set. Every PDF is written to a
+    temporary file and renamed once complete.
+    progress, if given, is called as progress(done, total) after each document.
+    should_stop, if given, is polled after each document; when it returns True
+    the remaining documents are dropped.
+    """
+    from core.simple_pdf import FPDF_MISSING, NotSimpleDocument, fpdf_available
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown PDF engine: {engine!r}")
+    if engine == "fpdf" and not fpdf_available():
+        raise RuntimeError(FPDF_MISSING)
+    fast = engine == "fpdf" or (engine == "auto" and fpdf_available())
+
+    sources = [Path(source) for source in sources]
+    result = PdfExportResult(len(sources))
+    started = time.perf_counter()
+    done = 0
+
+    def finished():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, result.total)
+        if should_stop and should_stop():
+            result.cancelled = True
+        return result.cancelled
+
+    pending = []  # (source, target) left to convert
+    for source in sources:
+        target = _target(source, output_folder)
+        if not force and _up_to_date(source, target):
+            result.skipped.append((source, target))
+            finished()
+        else:
+            pending.append((source, target))
+    if output_folder:
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    # Pure-Python renders, spread across processes
+    full = []  # documents LibreOffice has to render
+    if fast and pending and not result.cancelled:
+        # Spawned, not forked: exports are started from a worker thread of the GUI (see core.batch)
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(pending)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(render_fast, source, target): (source, target) for source, target in pending}
+            for future in as_completed(futures):
+                source, target = futures[future]
+                try:
+                    result.converted.append((source, future.result()))
+                    result.fast += 1
+                except NotSimpleDocument as e:
+                    if engine == "fpdf":
+                        result.errors.append((source, f"Not a simple document: {e}"))
+                    else:
+                        full.append((source, target))
+                        continue
+                except Exception as e:
+                    result.errors.append((source, str(e) or type(e).__name__))
+                if finished():
+                    for other in futures:
+                        other.cancel()
+                    break
+    elif not fast:
+        full = pending
+
+    # Everything else on warm LibreOffice instances
+    if full and not result.cancelled:
+        from core.pdf_converter import DEFAULT_WORKERS, ConverterService
+        try:
+            service = ConverterService(workers=workers or DEFAULT_WORKERS)
+        except RuntimeError as e:
+            # LibreOffice is not installed: only the simple documents could be rendered
+            result.errors += [(source, str(e)) for source, _ in full]
+            full = []
+    if full and not result.cancelled:
+        try:
+            futures = [(source, service.convert(source, target.parent)) for source, target in full]
+            for source, future in futures:
+                try:
+                    result.converted.append((source, future.result()))
+                except Exception as e:
+                    result.errors.append((source, str(e) or type(e).__name__))
+                if finished():
+                    for _, other in futures:
+                        other.cancel()
+                    break
+        finally:
+            service.shutdown()
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,280 @@
+import io
+import difflib
+from pathlib import Path
+import data.database as database
+from core.paths import get_contract_folder, get_facture_folder
+from core.values import FORM_FIELDS, COMPUTED_FIELDS, build_values
+from core.tracing import tracer
+from core.output_store import OutputStore, safe_filename, write_atomic
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class DocumentType:
+    """
+    A kind of generated document: how its values are computed, how its
+    files are named, where they go by default and how it is recorded.
+    """
+
+    def __init__(self, name, label, filename, get_folder, computed_fields=COMPUTED_FIELDS):
+        self.name = name
+        self.label = label
+        self.filename = filename  # format string over the template values
+        self.get_folder = get_folder
+        self.computed_fields = tuple(computed_fields)
+
+    def build_values(self, fields, today=None, strict=True):
+        return build_values(fields, self.computed_fields, today=today, strict=strict)
+
+    def get_filename(self, values):
+        return self.filename.format(**values)
+
+    @property
+    def fields(self):
+        """
+        Names of every value given to the templates: the form fields and those of the hooks.
+        """
+        return tuple(self.build_values({}, strict=False))
+
+
+DOCUMENT_TYPES = {}
+
+
+def register_document_type(document_type):
+    DOCUMENT_TYPES[document_type.name] = document_type
+    return document_type
+
+
+def get_document_type(name):
+    try:
+        return DOCUMENT_TYPES[name]
+    except KeyError:
+        raise ValueError(f"Unknown document type: {name!r}")
+
+
+CONTRACT = register_document_type(
+    DocumentType("contract", "Contract", "{VENDOR}-contract.docx", get_contract_folder))
+INVOICE = register_document_type(
+    DocumentType("invoice", "Invoice", "{VENDOR}-invoice.docx", get_facture_folder))
+
+
+class TemplateCheck:
+    """
+    The placeholders of a template compared with the values of a document type.
+    unknown are placeholders no field or hook provides, such as a misspelled
+    {{ CLEINT }}, with the closest known field in suggestions; they would render
+    empty, so the forms ask for them. unused are form fields the template does not show.
+    """
+
+    def __init__(self, variables, document_type):
+        provided = document_type.fields
+        self.variables = tuple(sorted(variables))
+        self.unknown = tuple(name for name in self.variables if name not in provided)
+        self.unused = tuple(name for name in FORM_FIELDS if name not in variables)
+        self.suggestions = {}
+        for name in self.unknown:
+            matches = difflib.get_close_matches(name.upper(), provided, n=1, cutoff=0.7)
+            if matches:
+                self.suggestions[name] = matches[0]
+
+    @property
+    def form_fields(self):
+        # The recorded fields are always typed, AMOUNT is needed for NONREFUNDABLE
+        return FORM_FIELDS + self.unknown
+
+    def problems(self):
+        """
+        Return one line per placeholder that is probably a mistake.
+        """
+        lines = []
+        for name in self.unknown:
+            if name in self.suggestions:
+                lines.append(f"{{{{ {name} }}}} is not a known field, did you mean {{{{ {self.suggestions[name]} }}}}?")
+        return lines
+
+    def summary(self):
+        lines = self.problems()
+        others = [name for name in self.unknown if name not in self.suggestions]
+        if others:
+            lines.append(f"Fields added to the form for this template: {', '.join(others)}.")
+        if self.unused:
+            lines.append(f"Fields not used by this template: {', '.join(self.unused)}.")
+        return "\n".join(lines)
+
+
+class GeneratedDocument:
+    """
+    A rendered document on its way through the output sinks.
+    Sinks fill in path, data and record as they handle it.
+    reused is True when an identical document was found in the output store
+    and nothing was rendered; path and record are then those of that document.
+    """
+
+    def __init__(self, document_type, values, doc):
+        self.document_type = document_type
+        self.values = values
+        self.doc = doc
+        self.filename = document_type.get_filename(values)
+        self.path = None
+        self.data = None
+        self.record = None
+        self.document_id = None
+        self.content_hash = None
+        self.reused = False
+
+
+class FolderSink:
+    """
+    Save the document as a .docx file in a folder, replacing the file atomically.
+    """
+    name = "save"
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+
+    def write(self, document):
+        buffer = io.BytesIO()
+        document.doc.save(buffer)
+        document.path = write_atomic(self.folder / safe_filename(document.filename), buffer.getvalue())
+
+
+class StoreSink:
+    """
+    Save the document in an OutputStore, under its ID and content hash.
+    """
+    name = "save"
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, document):
+        self.store.write(document)
+
+
+class BytesSink:
+    """
+    Keep the .docx file in memory, as document.data.
+    """
+    name = "save.bytes"
+
+    def write(self, document):
+        buffer = io.BytesIO()
+        document.doc.save(buffer)
+        document.data = buffer.getvalue()
+
+
+class DatabaseSink:
+    """
+    Insert the document into the contracts table, the ledger and the search index.
+    """
+    name = "database.insert"
+
+    def write(self, document):
+        row = record_row(document.values)
+        contract_id = database.insert_contract(*row, kind=document.document_type.name, path=document.path)
+        document.record = (contract_id, *row)
+
+
+def record_row(values):
+    """
+    Return the (client, vendor, amount, line1, line2, date) database row of a set of template values.
+    """
+    return (values["CLIENT"], values["VENDOR"], values["AMOUNT"], values["LINE1"], values["LINE2"], values["TODAY"])
+
+
+class DocumentPipeline:
+    """
+    Builds the values of a document type, renders its template and hands the
+    result to the output sinks, in order. Does not depend on the GUI.
+    With an output store, a document already produced from the same template
+    version and values is reused instead of being rendered again. Unless
+    add_to_store is False, new documents are then added to the store index;
+    callers recording documents themselves add the entries once recorded.
+    By default, documents go to the store of the type's folder and the database.
+    """
+
+    def __init__(self, document_type, sinks=None, store=None, add_to_store=True):
+        if isinstance(document_type, str):
+            document_type = get_document_type(document_type)
+        self.document_type = document_type
+        if sinks is None:
+            store = store or OutputStore(document_type.get_folder())
+            sinks = [StoreSink(store), DatabaseSink()]
+        self.sinks = list(sinks)
+        self.store = store
+        self.add_to_store = add_to_store
+        # A stored document without a database record can only be reused when nothing is recorded here
+        self.records = any(isinstance(sink, DatabaseSink) for sink in self.sinks)
+
+    def build_values(self, fields, today=None, strict=True):
+        return self.document_type.build_values(fields, today=today, strict=strict)
+
+    def check_template(self, template_path):
+        """
+        Compile a template, or load it from the template cache, and compare its placeholders with
+        the values of this document type. Raises on a file that is not a valid template.
+        """
+        from core.template_cache import template_cache
+        return TemplateCheck(template_cache.get(template_path).variables, self.document_type)
+
+    def render(self, template_path, values):
+        # docxtpl is only imported once the first document is rendered, it is slow to load
+        from core.template_cache import template_cache
+        with tracer.span("render"):
+            return GeneratedDocument(self.document_type, values, template_cache.render(template_path, values))
+
+    def generate(self, template_path, fields, today=None, progress=None, should_stop=None):
+        """
+        Build the values from fields, then render and write the document.
+        Raises ValueError on invalid fields.
+        """
+        return self.render_and_write(template_path, self.build_values(fields, today=today),
+                                     progress=progress, should_stop=should_stop)
+
+    def render_and_write(self, template_path, values, progress=None, should_stop=None):
+        """
+        Render the template with already built values and pass the document to every sink.
+        progress, if given, is called with a percentage after rendering and after each sink.
+        should_stop, if given, is polled between steps; GenerationCancelled is raised
+        when it returns True.
+        """
+        with tracer.span("generate", type=self.document_type.name):
+            document_id = None
+            if self.store is not None:
+                document_id = self.store.document_id(self.document_type, template_path, values)
+                entry = self.store.get(document_id)
+                if entry is not None and (entry["record"] or not self.records):
+                    return self.reuse(entry, values)
+
+            document = self.render(template_path, values)
+            document.document_id = document_id
+            for done, sink in enumerate(self.sinks):
+                if progress:
+                    progress(50 + 50 * done / len(self.sinks))
+                if should_stop and should_stop():
+                    raise GenerationCancelled()
+                with tracer.span(sink.name):
+                    sink.write(document)
+
+            if self.store is not None and self.add_to_store and document.content_hash:
+                self.store.add(self.store.entry(document))
+            return document
+
+    def reuse(self, entry, values):
+        document = GeneratedDocument(self.document_type, values, None)
+        document.document_id = entry["id"]
+        document.content_hash = entry["sha256"]
+        document.path = self.store.path(entry)
+        document.record = tuple(entry["record"]) if entry["record"] else None
+        document.reused = True
+        return document
+
+    def preview(self, template_path, fields, today=None):
+        """
+        Return the HTML preview of the template filled with fields, without writing anything.
+        Invalid fields are shown as typed.
+        """
+        from core.live_preview import get_live_preview
+        return get_live_preview(template_path).render(self.build_values(fields, today=today, strict=False))
@@ -0,0 +1,218 @@
+import re
+import hashlib
+import zipfile
+import threading
+import posixpath
+from collections import OrderedDict
+from html import escape
+from pathlib import Path
+from lxml import etree
+from core.tracing import tracer
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+HEADER_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+FOOTER_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+
+PAGE_STYLE = """
+<style>
+    table { border-collapse: collapse; margin: 6px 0; }
+    td { border: 1px solid #999; padding: 3px 6px; vertical-align: top; }
+    .header, .footer { color: #777; font-size: small; }
+    .header { border-bottom: 1px solid #ccc; margin-bottom: 8px; }
+    .footer { border-top: 1px solid #ccc; margin-top: 8px; }
+</style>
+"""
+
+
+def _is_on(element):
+    # <w:b/> means on, <w:b w:val="0"/> or "false" means off
+    return element is not None and element.get(W + "val") not in ("0", "false", "none")
+
+
+def _run_html(run):
+    parts = []
+    for child in run:
+        if child.tag == W + "t":
+            parts.append(escape(child.text or ""))
+        elif child.tag == W + "tab":
+            parts.append("&emsp;")
+        elif child.tag in (W + "br", W + "cr"):
+            parts.append("<br>")
+    html = "".join(parts)
+    if not html:
+        return ""
+
+    properties = run.find(W + "rPr")
+    if properties is not None:
+        if _is_on(properties.find(W + "b")):
+            html = f"<b>{html}</b>"
+        if _is_on(properties.find(W + "i")):
+            html = f"<i>{html}</i>"
+        if _is_on(properties.find(W + "u")):
+            html = f"<u>{html}</u>"
+    return html
+
+
+def _paragraph_html(paragraph):
+    tag = "p"
+    attributes = ""
+    properties = paragraph.find(W + "pPr")
+    if properties is not None:
+        style = properties.find(W + "pStyle")
+        if style is not None:
+            # "Heading1" in English templates, "Titre1" in French ones
+            match = re.match(r"(?:Heading|Titre)(\d)$", style.get(W + "val", ""))
+            if match:
+                tag = f"h{min(int(match.group(1)), 6)}"
+            elif style.get(W + "val") == "Title":
+                tag = "h1"
+        alignment = properties.find(W + "jc")
+        if alignment is not None and alignment.get(W + "val") in ("center", "right", "both"):
+            value = "justify" if alignment.get(W + "val") == "both" else alignment.get(W + "val")
+            attributes = f' align="{value}"'
+
+    content = "".join(_run_html(run) for run in paragraph.iter(W + "r"))
+    return f"<{tag}{attributes}>{content or '&nbsp;'}</{tag}>"
+
+
+def part_to_html(source):
+    """
+    Stream a WordprocessingML part and return its body as HTML.
+    Paragraphs are converted and freed as soon as they end, so memory
+    stays flat on long documents.
+    """
+    output = [[]]  # stack of buffers: the document, then one per open table cell
+    tables = []  # stack of open tables, each a list of rows of cell html
+
+    for event, element in etree.iterparse(source, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == W + "tbl":
+                tables.append([])
+            elif tag == W + "tr" and tables:
+                tables[-1].append([])
+            elif tag == W + "tc":
+                output.append([])
+            continue
+
+        if tag == W + "p":
+            output[-1].append(_paragraph_html(element))
+            element.clear()
+        elif tag == W + "tc" and len(output) > 1:
+            span = element.find(f"{W}tcPr/{W}gridSpan")
+            colspan = f' colspan="{span.get(W + "val")}"' if span is not None else ""
+            cell = "".join(output.pop())
+            if tables and tables[-1]:
+                tables[-1][-1].append(f"<td{colspan}>{cell}</td>")
+            element.clear()
+        elif tag == W + "tbl" and tables:
+            rows = "".join(f"<tr>{''.join(cells)}</tr>" for cells in tables.pop())
+            output[-1].append(f"<table>{rows}</table>")
+            element.clear()
+
+    return "".join(output[0])
+
+
+def _related_parts(archive, relation_type):
+    try:
+        rels = etree.fromstring(archive.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return []
+    return [
+        posixpath.normpath(posixpath.join("word", rel.get("Target")))
+        for rel in rels.iter(REL + "Relationship")
+        if rel.get("Type") == relation_type and rel.get("TargetMode") != "External"
+    ]
+
+
+@tracer.traced("preview.convert")
+def docx_to_html(path):
+    """
+    Convert a .docx file to HTML for the preview browser: paragraphs,
+    headings, bold/italic/underline runs, tables, headers and footers.
+    """
+    with zipfile.ZipFile(path) as archive:
+        sections = [PAGE_STYLE]
+        for name in _related_parts(archive, HEADER_TYPE):
+            with archive.open(name) as part:
+                sections.append(f'<div class="header">{part_to_html(part)}</div>')
+        with archive.open("word/document.xml") as part:
+            sections.append(part_to_html(part))
+        for name in _related_parts(archive, FOOTER_TYPE):
+            with archive.open(name) as part:
+                sections.append(f'<div class="footer">{part_to_html(part)}</div>')
+    return "".join(sections)
+
+
+def part_to_text(source):
+    """
+    Stream a WordprocessingML part and return its text, one line per paragraph.
+    """
+    lines = []
+    for _, element in etree.iterparse(source, tag=W + "p"):
+        text = "".join(node.text or "" for node in element.iter(W + "t"))
+        if text:
+            lines.append(text)
+        element.clear()
+    return "\n".join(lines)
+
+
+def docx_to_text(path):
+    """
+    Return the plain text of a .docx file: headers, body and footers.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = _related_parts(archive, HEADER_TYPE) + ["word/document.xml"] + _related_parts(archive, FOOTER_TYPE)
+        parts = []
+        for name in names:
+            with archive.open(name) as part:
+                parts.append(part_to_text(part))
+    return "\n".join(part for part in parts if part)
+
+
+class PreviewCache:
+    """
+    HTML previews keyed by file content hash, with a path + mtime + size
+    fast path so an unchanged file is not even re-read.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # content hash -> html
+        self._by_stat = {}  # (path, mtime_ns, size) -> content hash
+        self._lock = threading.Lock()
+
+    @tracer.traced("preview.html")
+    def get_html(self, path):
+        path = Path(path).resolve()
+        stat = path.stat()
+        stat_key = (str(path), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._by_stat.get(stat_key)
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        with self._lock:
+            html = self._entries.get(digest)
+        if html is None:
+            html = docx_to_html(path)
+
+        with self._lock:
+            self._entries[digest] = html
+            self._entries.move_to_end(digest)
+            for key in [k for k in self._by_stat if k[0] == stat_key[0]]:
+                del self._by_stat[key]
+            self._by_stat[stat_key] = digest
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                for key in [k for k, v in self._by_stat.items() if v == evicted]:
+                    del self._by_stat[key]
+            return html
+
+
+# Shared by the template, contract and invoice previews
+preview_cache = PreviewCache()
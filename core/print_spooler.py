@@ -0,0 +1,382 @@
+"""
+Print spooler: documents are queued, converted to PDF once (the PDFs are
+cached by content) and sent to the printer in batches, one lp call for all
+the documents waiting at that time. The printer jobs are then followed until
+they leave the CUPS queue.
+
+The backend is chosen with the PRINT_BACKEND environment variable:
+"lp" (the default printer), "lp:<printer>", or "folder:<path>" which copies
+the PDFs to a folder instead of printing them, for testing.
+
+Documents are converted by LibreOffice, so that they print as they look in
+Word. PRINT_PDF_ENGINE=auto renders the simple ones with fpdf instead, which is
+faster but only approximates their layout (see core.pdf_export.ENGINES).
+"""
+import os
+import re
+import sys
+import time
+import queue
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from core.paths import get_cache_folder
+from core.pdf_export import ENGINES
+from core.tracing import tracer
+
+BACKEND_ENV_VAR = "PRINT_BACKEND"
+ENGINE_ENV_VAR = "PRINT_PDF_ENGINE"
+DEFAULT_ENGINE = "libreoffice"
+BATCH_DELAY = 0.2  # seconds the spooler waits for more documents before sending a batch
+POLL_INTERVAL = 2.0  # seconds between two checks of the printer queue
+MAX_CACHED_PDFS = 500
+
+QUEUED = "Queued"
+CONVERTING = "Converting"
+SENT = "Sent"
+COMPLETED = "Completed"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class PrintRequest:
+    """
+    Documents sent to print together. status moves from QUEUED through CONVERTING
+    and SENT to one of FINISHED; job_id is the printer job, shared by the requests
+    sent in the same batch.
+    """
+
+    def __init__(self, paths, title):
+        self.paths = [Path(path) for path in paths]
+        self.title = title
+        self.status = QUEUED
+        self.pdfs = []
+        self.job_id = None
+        self.error = None
+        self.listeners = []  # called as listener(request) from the spooler thread on each change
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the request is finished, and return whether it is.
+        """
+        return self._finished.wait(timeout)
+
+    def _set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        if status in FINISHED:
+            self._finished.set()
+        for listener in self.listeners:
+            listener(self)
+
+
+class PdfCache:
+    """
+    PDFs of the documents sent to print, named after the sha256 of the document
+    so that printing a document again does not convert it again. engine is one
+    of core.pdf_export.ENGINES, by default the PRINT_PDF_ENGINE environment
+    variable or LibreOffice.
+    """
+
+    def __init__(self, folder, max_entries=MAX_CACHED_PDFS, engine=None):
+        engine = engine or os.getenv(ENGINE_ENV_VAR) or DEFAULT_ENGINE
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown PDF engine: {engine!r}")
+        self.folder = Path(folder)
+        self.max_entries = max_entries
+        self.engine = engine
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the PDF of a document, converting it on first use. PDF files are printed as they are.
+        """
+        path = Path(path)
+        if path.suffix.lower() == ".pdf":
+            return path
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        # PDFs of another engine than LibreOffice's are kept apart, they do not look the same
+        target = self.folder / (f"{digest}.pdf" if self.engine == DEFAULT_ENGINE else f"{digest}.{self.engine}.pdf")
+        if target.exists():
+            os.utime(target)  # most recently used, pruned last
+            return target
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._convert(path, target)
+        self._prune()
+        return target
+
+    def _convert(self, path, target):
+        from core.simple_pdf import NotSimpleDocument, fpdf_available, render_pdf
+        if self.engine == "fpdf" or (self.engine == "auto" and fpdf_available()):
+            try:
+                render_pdf(path, target)
+                return
+            except NotSimpleDocument:
+                if self.engine == "fpdf":
+                    raise
+        from core.pdf_converter import convert_to_pdf
+        # The converter names the PDF after the document, so convert in a folder of its own
+        folder = tempfile.mkdtemp(prefix=".convert-", dir=self.folder)
+        try:
+            os.replace(convert_to_pdf(path, folder), target)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def _prune(self):
+        with self.lock:
+            pdfs = sorted(self.folder.glob("*.pdf"), key=lambda pdf: pdf.stat().st_mtime)
+            for pdf in pdfs[:max(len(pdfs) - self.max_entries, 0)]:
+                pdf.unlink(missing_ok=True)
+
+
+class LpBackend:
+    """
+    CUPS: one lp call per batch, lpstat to follow the jobs.
+    """
+
+    def __init__(self, printer=None):
+        self.printer = printer
+
+    def submit(self, pdfs, title):
+        args = ["lp", "-t", title] + (["-d", self.printer] if self.printer else []) + ["--"] + [str(pdf) for pdf in pdfs]
+        process = subprocess.run(args, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.strip() or f"lp exited with status {process.returncode}")
+        # "request id is Office-42 (3 file(s))"
+        match = re.search(r"request id is (\S+)", process.stdout)
+        return match.group(1) if match else None
+
+    def pending(self, job_ids):
+        """
+        Return the jobs among job_ids still waiting or printing.
+        """
+        try:
+            process = subprocess.run(["lpstat", "-o"], capture_output=True, text=True)
+        except FileNotFoundError:
+            return set()  # no lpstat, the jobs cannot be followed
+        if process.returncode != 0:
+            return set(job_ids)  # unknown, ask again later
+        queued = {line.split()[0] for line in process.stdout.splitlines() if line.strip()}
+        return {job_id for job_id in job_ids if job_id in queued}
+
+    def cancel(self, job_id):
+        try:
+            subprocess.run(["cancel", job_id], capture_output=True)
+        except FileNotFoundError:
+            pass
+
+
+class WindowsBackend:
+    """
+    Windows has no lp: each PDF is printed on the default printer by its default application.
+    """
+
+    def submit(self, pdfs, title):
+        for pdf in pdfs:
+            os.startfile(str(pdf), "print")
+        return None
+
+    def pending(self, job_ids):
+        return set()
+
+    def cancel(self, job_id):
+        pass
+
+
+class FolderBackend:
+    """
+    Stand-in printer for tests: each batch is copied to a folder of its own.
+    """
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.lock = threading.Lock()
+
+    def submit(self, pdfs, title):
+        with self.lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            number = len(list(self.folder.glob("job-*"))) + 1
+            job_folder = self.folder / f"job-{number:05d}"
+            job_folder.mkdir()
+        for index, pdf in enumerate(pdfs, start=1):
+            shutil.copyfile(pdf, job_folder / f"{index:03d}-{Path(pdf).name}")
+        (job_folder / "title.txt").write_text(title, encoding="utf-8")
+        return job_folder.name
+
+    def pending(self, job_ids):
+        return set()
+
+    def cancel(self, job_id):
+        pass
+
+
+def get_backend(spec=None):
+    """
+    Return the print backend of a PRINT_BACKEND value, by default the environment's.
+    """
+    spec = spec if spec is not None else os.getenv(BACKEND_ENV_VAR, "")
+    name, _, argument = spec.partition(":")
+    if name == "folder":
+        if not argument:
+            raise ValueError(f"{BACKEND_ENV_VAR}=folder needs a path, such as folder:/tmp/printed")
+        return FolderBackend(argument)
+    if name in ("", "lp"):
+        if sys.platform == "win32" and not argument:
+            return WindowsBackend()
+        return LpBackend(argument or None)
+    raise ValueError(f"Unknown print backend: {spec!r}")
+
+
+class PrintSpooler:
+    """
+    Queue of print requests served by one background thread, which converts the
+    documents, sends whatever is waiting as a single printer job and polls the
+    printer queue for the jobs sent.
+    """
+
+    def __init__(self, backend=None, cache=None, batch_delay=BATCH_DELAY, poll_interval=POLL_INTERVAL):
+        self.backend = backend or get_backend()
+        self.cache = cache or PdfCache(get_cache_folder() / "print")
+        self.batch_delay = batch_delay
+        self.poll_interval = poll_interval
+        self.requests = queue.Queue()
+        self.sent = []  # requests waiting for their printer job to complete
+        self.lock = threading.RLock()  # listeners may cancel from within a status change
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def submit(self, paths, title=None, listener=None):
+        """
+        Queue documents to print together and return their PrintRequest.
+        """
+        paths = list(paths)
+        if not paths:
+            raise ValueError("Nothing to print.")
+        request = PrintRequest(paths, title or (Path(paths[0]).name if len(paths) == 1 else f"{len(paths)} documents"))
+        if listener:
+            request.listeners.append(listener)
+        self.requests.put(request)
+        return request
+
+    def cancel(self, request):
+        """
+        Cancel a request. Once sent, this cancels the printer job, with the
+        other requests of the same batch.
+        """
+        with self.lock:
+            if request.finished:
+                return
+            if request.status != SENT:
+                request._set_status(CANCELLED)
+                return
+            batch = [other for other in self.sent if other.job_id == request.job_id]
+            self.sent = [other for other in self.sent if other.job_id != request.job_id]
+        self.backend.cancel(request.job_id)
+        for other in batch:
+            other._set_status(CANCELLED)
+
+    def _serve(self):
+        last_poll = time.monotonic()
+        while True:
+            try:
+                request = self.requests.get(timeout=self.poll_interval if self.sent else None)
+            except queue.Empty:
+                request = False
+            if request is None:
+                return
+            if request:
+                # Gather everything submitted meanwhile into the same printer job
+                batch = [request]
+                while True:
+                    try:
+                        request = self.requests.get(timeout=self.batch_delay)
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        self.requests.put(None)
+                        break
+                    batch.append(request)
+                self._send(batch)
+            if self.sent and time.monotonic() - last_poll >= self.poll_interval:
+                last_poll = time.monotonic()
+                self._poll()
+
+    def _send(self, batch):
+        ready = []
+        for request in batch:
+            with self.lock:
+                if request.finished:
+                    continue
+                request._set_status(CONVERTING)
+            try:
+                request.pdfs = [self.cache.get(path) for path in request.paths]
+            except Exception as e:
+                request._set_status(FAILED, f"Could not convert to PDF: {e}")
+                continue
+            if not request.finished:
+                ready.append(request)
+        if not ready:
+            return
+
+        title = ready[0].title if len(ready) == 1 else f"{len(ready)} print requests"
+        try:
+            with tracer.span("print"):
+                job_id = self.backend.submit([pdf for request in ready for pdf in request.pdfs], title)
+        except Exception as e:
+            for request in ready:
+                request._set_status(FAILED, str(e) or type(e).__name__)
+            return
+        with self.lock:
+            for request in ready:
+                request.job_id = job_id
+                if request.finished:
+                    continue
+                if job_id is None:
+                    # The backend cannot follow its jobs
+                    request._set_status(COMPLETED)
+                else:
+                    request._set_status(SENT)
+                    self.sent.append(request)
+
+    def _poll(self):
+        with self.lock:
+            job_ids = {request.job_id for request in self.sent}
+        try:
+            pending = self.backend.pending(job_ids)
+        except Exception:
+            return
+        with self.lock:
+            done = [request for request in self.sent if request.job_id not in pending]
+            self.sent = [request for request in self.sent if request.job_id in pending]
+        for request in done:
+            request._set_status(COMPLETED)
+
+    def shutdown(self):
+        self.requests.put(None)
+        self.thread.join(timeout=10)
+
+
+_spooler = None
+_spooler_lock = threading.Lock()
+
+
+def get_spooler():
+    """
+    Return the shared print spooler, starting it on first use.
+    """
+    global _spooler
+    with _spooler_lock:
+        if _spooler is None:
+            _spooler = PrintSpooler()
+            atexit.register(_spooler.shutdown)
+        return _spooler
@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+import data.database as database
+from core.pipeline import DOCUMENT_TYPES, DocumentPipeline, StoreSink, BytesSink, get_document_type, record_row
+from core.output_store import OutputStore
+from core.tracing import percentile
+
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class RequestError(Exception):
+    """
+    A request the service refuses, answered with the given HTTP status.
+    """
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Metrics:
+    """
+    Counters and the latencies of the most recent operations, by name.
+    """
+
+    def __init__(self, samples=1000):
+        self.samples = samples
+        self.counters = {}
+        self.latencies = {}
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        self.latencies.setdefault(name, deque(maxlen=self.samples)).append(seconds * 1000)
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "latency_ms": {
+                name: {
+                    "count": len(values),
+                    "p50": percentile(values, 0.5),
+                    "p95": percentile(values, 0.95),
+                    "max": max(values),
+                }
+                for name, values in self.latencies.items() if values
+            },
+        }
+
+
+_pipelines = {}  # (document type, output) -> pipeline, one set per worker process
+
+
+def _get_pipeline(document_type, output):
+    pipeline = _pipelines.get((document_type.name, output))
+    if pipeline is None:
+        if output == "folder":
+            # The store entries are added by the service once the documents are recorded
+            store = OutputStore(document_type.get_folder())
+            pipeline = DocumentPipeline(document_type, [StoreSink(store)], store=store, add_to_store=False)
+        else:
+            pipeline = DocumentPipeline(document_type, [BytesSink()])
+        _pipelines[(document_type.name, output)] = pipeline
+    return pipeline
+
+
+def render_documents(document_type, template_path, items):
+    """
+    Render a group of documents sharing one template. Runs inside the worker processes,
+    each of which keeps its own template cache, so the template is parsed once per process.
+    items are (fields, output) pairs, output being "folder" or "bytes".
+    Returns one (values, path, data, error, seconds, store entry, reused) tuple per item.
+    """
+    document_type = get_document_type(document_type)
+    results = []
+    for fields, output in items:
+        started = time.perf_counter()
+        try:
+            pipeline = _get_pipeline(document_type, output)
+            document = pipeline.generate(template_path, fields)
+            path = str(document.path) if document.path else None
+            entry = pipeline.store.entry(document) if pipeline.store else None
+            results.append((document.values, path, document.data, None, time.perf_counter() - started,
+                            entry, document.reused))
+        except Exception as e:
+            results.append((None, None, None, str(e), time.perf_counter() - started, None, False))
+    return results
+
+
+def parse_documents(payload):
+    """
+    Validate a render request: a document object, a list of them or {"documents": [...]}.
+    Each document is {"type": "contract" | "invoice", "template": path, "fields": {...},
+    "output": "folder" | "bytes"}; type defaults to contract and output to folder.
+    """
+    if isinstance(payload, dict) and "documents" in payload:
+        payload = payload["documents"]
+    documents = payload if isinstance(payload, list) else [payload]
+    if not documents:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "No documents to render.")
+
+    parsed = []
+    for number, document in enumerate(documents):
+        if not isinstance(document, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Document {number}: expected an object.")
+        document_type = document.get("type", "contract")
+        template = document.get("template")
+        fields = document.get("fields", {})
+        output = document.get("output", "folder")
+        if document_type not in DOCUMENT_TYPES:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Document {number}: unknown type {document_type!r}.")
+        if not isinstance(template, str) or not template:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Document {number}: missing template path.")
+        if not isinstance(fields, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Document {number}: fields must be an object.")
+        if output not in ("folder", "bytes"):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Document {number}: output must be 'folder' or 'bytes'.")
+        fields = {str(key).upper(): "" if value is None else str(value) for key, value in fields.items()}
+        parsed.append((document_type, template, fields, output))
+    return parsed
+
+
+class GenerationService:
+    """
+    Renders documents for the HTTP API on a process pool.
+    Requests are grouped by document type and template, and the groups are cut in
+    chunks of chunk_size documents so each chunk is rendered by one worker from a
+    single parsed template. At most max_pending documents are accepted at once,
+    requests above that are refused until the queue drains.
+    """
+
+    def __init__(self, workers=None, max_pending=1000, chunk_size=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.metrics = Metrics()
+        self.pending = 0  # accepted documents not yet answered
+        self.running = 0  # documents being rendered by a worker
+        self._slots = None
+        self._stores = {}  # document type -> output store of its folder
+
+    async def render(self, documents):
+        """
+        Render the parsed documents and record them in the database.
+        Returns one result dict per document, in request order.
+        """
+        if self.pending + len(documents) > self.max_pending:
+            self.metrics.count("rejected")
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many pending documents, retry later.",
+                               {"Retry-After": "1"})
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        self.pending += len(documents)
+        try:
+            groups = OrderedDict()  # (type, template) -> [(index, fields, output)]
+            for index, (document_type, template, fields, output) in enumerate(documents):
+                groups.setdefault((document_type, template), []).append((index, fields, output))
+
+            tasks = []
+            for (document_type, template), items in groups.items():
+                for start in range(0, len(items), self.chunk_size):
+                    tasks.append(self._render_chunk(document_type, template, items[start:start + self.chunk_size]))
+
+            results = [None] * len(documents)
+            for chunk in await asyncio.gather(*tasks):
+                for index, result in chunk:
+                    results[index] = result
+            return results
+        finally:
+            self.pending -= len(documents)
+
+    def _get_store(self, document_type):
+        store = self._stores.get(document_type)
+        if store is None:
+            store = self._stores[document_type] = OutputStore(get_document_type(document_type).get_folder())
+        return store
+
+    async def _render_chunk(self, document_type, template, items):
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            self.running += len(items)
+            try:
+                rendered = await loop.run_in_executor(
+                    self.executor, render_documents, document_type, template,
+                    [(fields, output) for _, fields, output in items])
+            finally:
+                self.running -= len(items)
+
+        results = []
+        generated = []  # (result, values, store entry) of the documents to record
+        for (index, _, _), (values, path, data, error, seconds, entry, reused) in zip(items, rendered):
+            if error:
+                self.metrics.count("documents_failed")
+                results.append((index, {"index": index, "error": error}))
+                continue
+            self.metrics.count("documents_generated")
+            self.metrics.observe("render", seconds)
+            result = {"index": index, "type": document_type, "filename": get_document_type(document_type).get_filename(values)}
+            if path:
+                result["path"] = path
+            if data is not None:
+                result["data"] = data
+            results.append((index, result))
+            if reused and entry["record"]:
+                # Already produced and recorded by an earlier request
+                self.metrics.count("documents_reused")
+                result["id"] = entry["record"][0]
+                result["reused"] = True
+            else:
+                generated.append((result, values, entry))
+
+        # One transaction per chunk, off the event loop
+        if generated:
+            started = time.perf_counter()
+            records = await loop.run_in_executor(
+                None, database.insert_many, [record_row(values) for _, values, _ in generated], document_type,
+                [result.get("path") for result, _, _ in generated])
+            self.metrics.observe("database", time.perf_counter() - started)
+            for (result, _, entry), record in zip(generated, records):
+                result["id"] = record[0]
+                if entry:
+                    self._get_store(document_type).add(dict(entry, record=list(record)))
+        return results
+
+    def snapshot(self):
+        snapshot = self.metrics.snapshot()
+        snapshot.update(
+            queue_depth=self.pending - self.running,
+            in_flight=self.running,
+            max_pending=self.max_pending,
+            workers=self.workers,
+        )
+        return snapshot
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class HttpServer:
+    """
+    Minimal HTTP/1.1 front-end of the generation service, meant to listen on localhost:
+        POST /render   render one or several documents (see parse_documents);
+                       a single document with output "bytes" is answered with the .docx itself,
+                       otherwise with JSON, bytes being base64-encoded
+        GET /metrics   queue depth, in-flight documents, counters and latencies
+        GET /health
+    """
+
+    def __init__(self, service, max_body=16 * 1024 * 1024):
+        self.service = service
+        self.max_body = max_body
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+                length = int(headers.get("content-length", 0) or 0)
+                if length > self.max_body:
+                    # The body is not read, so the connection cannot be reused
+                    await self.send_json(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                         {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                await self.dispatch(writer, method, urlsplit(target).path, body, keep_alive)
+                self.service.metrics.observe("request", time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method, path, body, keep_alive):
+        self.service.metrics.count("requests")
+        try:
+            if path == "/render" and method == "POST":
+                await self.render(writer, body, keep_alive)
+            elif path == "/metrics" and method == "GET":
+                await self.send_json(writer, HTTPStatus.OK, self.service.snapshot(), keep_alive)
+            elif path == "/health" and method == "GET":
+                await self.send_json(writer, HTTPStatus.OK, {"status": "ok"}, keep_alive)
+            else:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}.")
+        except RequestError as e:
+            self.service.metrics.count("errors")
+            await self.send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+        except Exception as e:
+            # Anything else is a bug of the service: answer it rather than dropping the connection
+            self.service.metrics.count("errors")
+            traceback.print_exc()
+            await self.send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                 {"error": f"Internal error: {str(e) or type(e).__name__}"}, keep_alive)
+
+    async def render(self, writer, body, keep_alive):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+        documents = parse_documents(payload)
+        results = await self.service.render(documents)
+
+        # A single document asked as bytes is streamed back as the .docx file itself
+        if not isinstance(payload, list) and "documents" not in payload and documents[0][3] == "bytes":
+            result = results[0]
+            if "error" in result:
+                raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, result["error"])
+            headers = {
+                "Content-Disposition": f'attachment; filename="{result["filename"]}"',
+                "X-Document-Id": str(result["id"]),
+            }
+            await self.send(writer, HTTPStatus.OK, result["data"], DOCX_MIME_TYPE, keep_alive, headers)
+            return
+
+        for result in results:
+            if "data" in result:
+                result["data"] = base64.b64encode(result["data"]).decode("ascii")
+        status = HTTPStatus.OK if not any("error" in result for result in results) else HTTPStatus.MULTI_STATUS
+        await self.send_json(writer, status, {"documents": results}, keep_alive)
+
+    async def send_json(self, writer, status, payload, keep_alive=True, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self.send(writer, status, body, "application/json; charset=utf-8", keep_alive, headers)
+
+    async def send(self, writer, status, body, content_type, keep_alive=True, headers=None):
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
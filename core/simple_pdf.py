@@ -0,0 +1,181 @@
+"""
+Pure-Python PDF rendering of simple documents, without LibreOffice.
+A document is simple when it only holds text paragraphs and plain tables in
+fonts the PDF core fonts can show; anything else raises NotSimpleDocument
+and is left to LibreOffice.
+"""
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from core.output_store import write_atomic
+
+PAGE_MARGIN = 20  # mm
+LINE_HEIGHT = 5.5  # mm, for the 11 pt body text
+ALIGNMENTS = {0: "L", 1: "C", 2: "R", 3: "J"}  # WD_ALIGN_PARAGRAPH -> fpdf
+HEADING_SIZES = {"Title": 18, "Heading 1": 16, "Heading 2": 14, "Heading 3": 12}
+
+# Both provide the fpdf module; neither is required, LibreOffice renders everything otherwise
+FPDF_MISSING = "Rendering PDFs without LibreOffice requires the 'fpdf' package (PyFPDF 1.7) or 'fpdf2'."
+
+# Content the core fonts and plain text cells cannot reproduce
+_COMPLEX_CONTENT = (
+    ".//w:drawing | .//w:pict | .//w:object | .//w:txbxContent | .//w:tc//w:tbl"
+    " | .//w:gridSpan | .//w:vMerge | .//*[local-name() = 'oMath']"
+)
+
+
+class NotSimpleDocument(Exception):
+    pass
+
+
+def _core_font_text(text):
+    # PyFPDF 1.7 writes text as Latin-1 but its core fonts use the Windows-1252 layout, where € and ’ live
+    return text.encode("cp1252").decode("latin-1")
+
+
+def fpdf_available():
+    try:
+        import fpdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _check_simple(document):
+    parts = [document.element.body]
+    for section in document.sections:
+        parts += [section.header._element, section.footer._element]
+    for part in parts:
+        if part.xpath(_COMPLEX_CONTENT):
+            raise NotSimpleDocument("images, text boxes, merged cells or nested tables")
+        text = "".join(part.itertext())
+        try:
+            text.encode("cp1252")
+        except UnicodeEncodeError:
+            raise NotSimpleDocument("characters the PDF core fonts cannot show")
+
+
+def _pdf_class():
+    from fpdf import FPDF
+
+    class SimplePdf(FPDF):
+        header_lines = ()
+        footer_lines = ()
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if hasattr(self, "core_fonts_encoding"):  # fpdf2 converts the text itself
+                self.core_fonts_encoding = "windows-1252"
+                self.convert_text = str
+            else:
+                self.convert_text = _core_font_text
+
+        def header(self):
+            self.set_font("Helvetica", "", 8)
+            for line in self.header_lines:
+                self.cell(0, 4, self.convert_text(line), 0, 1, "C")
+            if self.header_lines:
+                self.ln(4)
+
+        def footer(self):
+            self.set_y(-PAGE_MARGIN + 5)
+            self.set_font("Helvetica", "", 8)
+            for line in self.footer_lines:
+                self.cell(0, 4, self.convert_text(line), 0, 1, "C")
+
+    return SimplePdf
+
+
+def _wrap(pdf, text, width):
+    # Greedy word wrap on the current font, long words are cut
+    lines = []
+    for source_line in text.split("\n"):
+        line = ""
+        for word in source_line.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if pdf.get_string_width(candidate) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while pdf.get_string_width(word) > width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and pdf.get_string_width(word[:cut]) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+def _paragraph(pdf, paragraph):
+    text = paragraph.text
+    if not text.strip():
+        pdf.ln(LINE_HEIGHT)
+        return
+    runs = [run for run in paragraph.runs if run.text.strip()]
+    bold = bool(runs) and all(run.bold for run in runs)
+    size = HEADING_SIZES.get(paragraph.style.name if paragraph.style is not None else "", 11)
+    pdf.set_font("Helvetica", "B" if bold or size > 11 else "", size)
+    align = ALIGNMENTS.get(paragraph.alignment, "L")
+    pdf.multi_cell(0, LINE_HEIGHT * size / 11, pdf.convert_text(text), 0, align)
+    if size > 11:
+        pdf.ln(2)
+
+
+def _table(pdf, table):
+    pdf.set_font("Helvetica", "", 10)
+    width = (pdf.w - pdf.l_margin - pdf.r_margin) / max(len(table.columns), 1)
+    line_height = LINE_HEIGHT * 10 / 11
+    for row in table.rows:
+        cells = [_wrap(pdf, pdf.convert_text(cell.text), width - 2) for cell in row.cells]
+        height = max(len(lines) for lines in cells) * line_height + 2
+        if pdf.get_y() + height > pdf.page_break_trigger:
+            pdf.add_page()
+        y = pdf.get_y()
+        for column, lines in enumerate(cells):
+            x = pdf.l_margin + column * width
+            pdf.rect(x, y, width, height)
+            for number, line in enumerate(lines):
+                pdf.set_xy(x + 1, y + 1 + number * line_height)
+                pdf.cell(width - 2, line_height, line)
+        pdf.set_xy(pdf.l_margin, y + height)
+    pdf.ln(LINE_HEIGHT)
+
+
+def render_pdf_bytes(source):
+    """
+    Render a simple .docx document to PDF and return the PDF bytes.
+    Raises NotSimpleDocument when the document needs a full renderer.
+    """
+    if not fpdf_available():
+        raise RuntimeError(FPDF_MISSING)
+    document = Document(source)
+    _check_simple(document)
+
+    pdf = _pdf_class()(format="A4", unit="mm")
+    pdf.set_margins(PAGE_MARGIN, PAGE_MARGIN, PAGE_MARGIN)
+    pdf.set_auto_page_break(True, PAGE_MARGIN)
+    section = document.sections[0]
+    pdf.header_lines = [p.text for p in section.header.paragraphs if p.text.strip()]
+    pdf.footer_lines = [p.text for p in section.footer.paragraphs if p.text.strip()]
+    pdf.add_page()
+
+    # Body content in document order
+    for child in document.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            _paragraph(pdf, Paragraph(child, document))
+        elif child.tag.endswith("}tbl"):
+            _table(pdf, Table(child, document))
+
+    if hasattr(pdf, "epw"):  # fpdf2
+        return bytes(pdf.output())
+    return pdf.output(dest="S").encode("latin-1")  # PyFPDF 1.7
+
+
+def render_pdf(source, target):
+    """
+    Render a simple .docx document to a PDF file, written atomically, and return its path.
+    """
+    return write_atomic(target, render_pdf_bytes(source))
@@ -0,0 +1,92 @@
+"""
+UNO calls shared by the converter workers. Also run as a script by a Python
+that can import uno, such as the one bundled with LibreOffice, when the
+application's own Python cannot: it connects to a LibreOffice instance
+listening on a pipe and converts the documents it is given, one JSON request
+per line on stdin, answering one JSON line each on stdout:
+
+    {"source": "/path/a.docx", "target": "/path/a.pdf"}  ->  {"ok": true} or {"error": "..."}
+
+It only uses the standard library and uno, so that it runs on whatever Python
+LibreOffice comes with.
+"""
+import sys
+import json
+import time
+
+
+def connect(pipe_name, timeout, is_running=None):
+    """
+    Connect to the LibreOffice instance listening on pipe_name and return its
+    desktop. Raises RuntimeError when it is not up within timeout seconds, or
+    as soon as is_running, if given, returns False.
+    """
+    import uno
+    from com.sun.star.connection import NoConnectException
+
+    local_context = uno.getComponentContext()
+    resolver = local_context.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_context)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            context = resolver.resolve(f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext")
+            return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        except NoConnectException:
+            if (is_running and not is_running()) or time.monotonic() > deadline:
+                raise RuntimeError("LibreOffice did not start")
+            time.sleep(0.2)
+
+
+def convert(desktop, source, target):
+    """
+    Convert the document source to the PDF target with the given desktop.
+    """
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name = name
+        p.Value = value
+        return p
+
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(str(source)), "_blank", 0, (prop("Hidden", True), prop("ReadOnly", True)))
+    if doc is None:
+        raise RuntimeError(f"LibreOffice could not open {source}")
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(str(target)), (prop("FilterName", "writer_pdf_Export"),))
+    finally:
+        doc.close(True)
+
+
+def _reply(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main(pipe_name, timeout):
+    try:
+        desktop = connect(pipe_name, float(timeout))
+    except Exception as e:
+        _reply({"error": str(e) or type(e).__name__})
+        return 1
+    _reply({"ok": True})
+    # Serves until the converter closes stdin
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            convert(desktop, request["source"], request["target"])
+            _reply({"ok": True})
+        except Exception as e:
+            _reply({"error": str(e) or type(e).__name__})
+    try:
+        desktop.terminate()
+    except Exception:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:3]))
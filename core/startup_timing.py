@@ -0,0 +1,55 @@
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Collects cold-start timings: consecutive phases (imports, QApplication,
+    main window, first paint) and individually measured steps such as tab builds.
+    Does nothing unless enabled.
+    """
+
+    def __init__(self, enabled=True, start=None):
+        self.enabled = enabled
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = []  # (label, duration in ms)
+        self.steps = []  # (label, duration in ms)
+
+    def mark(self, label):
+        """
+        Record the time spent since the previous mark as a phase.
+        """
+        now = time.perf_counter()
+        self.phases.append((label, (now - self.last) * 1000))
+        self.last = now
+
+    @contextmanager
+    def measure(self, label):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.steps.append((label, duration))
+            # Tabs built after startup are reported as they happen
+            if self.enabled and self.phases and self.phases[-1][0] == "first paint":
+                print(f"[startup] {label}: {duration:.1f} ms", file=sys.stderr)
+
+    def total_ms(self):
+        return (self.last - self.start) * 1000
+
+    def report(self, target_ms=None, file=None):
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        print("[startup] cold start timings", file=file)
+        for label, duration in self.phases:
+            print(f"[startup]   {label:<20} {duration:8.1f} ms", file=file)
+        for label, duration in self.steps:
+            print(f"[startup]     {label:<18} {duration:8.1f} ms", file=file)
+        total = self.total_ms()
+        print(f"[startup]   {'total':<20} {total:8.1f} ms", file=file)
+        if target_ms is not None and total > target_ms:
+            print(f"[startup] WARNING: cold start {total:.0f} ms exceeds the {target_ms:.0f} ms target", file=file)
@@ -0,0 +1,252 @@
+import io
+import re
+import sys
+import marshal
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+import jinja2
+import docxtpl
+from jinja2 import Environment, meta
+from docxtpl import DocxTemplate
+from core.paths import get_cache_folder
+from core.tracing import tracer
+from core.output_store import write_atomic
+
+# Same settings as jinja2.Template(), which docxtpl renders with
+_environment = Environment()
+
+# Compiled code can only be loaded back by the same Python, Jinja and docxtpl versions
+DISK_CACHE_TAG = f"{sys.implementation.cache_tag}-jinja{jinja2.__version__}-docxtpl{docxtpl.__version__}-1"
+
+
+def _compile(xml):
+    # Same paragraph splitting as DocxTemplate.render_xml_part, so error line numbers match
+    ast = _environment.parse(re.sub(r'<w:p([ >])', r'\n<w:p\1', xml))
+    variables = meta.find_undeclared_variables(ast) - set(_environment.globals)
+    return _environment.compile(ast), variables
+
+
+def _template(code):
+    return _environment.template_class.from_code(_environment, code, _environment.make_globals(None))
+
+
+class CompiledTemplate:
+    """
+    A .docx template whose body, headers and footers have been patched and compiled to Jinja once.
+    variables is the set of placeholders it uses, such as CLIENT or TODAY.
+    """
+
+    def __init__(self, path, data, digest, state=None):
+        self.path = Path(path)
+        self.data = data
+        self.digest = digest
+        self.size = len(data)
+
+        state = state or self.compile_state(data)
+        self.body_xml = state["body_xml"]
+        self.body = _template(state["body"])
+        self.parts = {}
+        self.part_xml = {}  # header/footer rel key -> (relationship type, patched xml)
+        for rel_key, (uri, encoding, xml, code) in state["parts"].items():
+            self.part_xml[rel_key] = (uri, xml)
+            self.parts[rel_key] = (encoding, _template(code))
+        self.variables = frozenset(state["variables"])
+        self.live_preview = None  # built on demand by core.live_preview
+
+    @staticmethod
+    def compile_state(data):
+        """
+        Parse and compile a template file to a state that marshal can save and
+        CompiledTemplate can be built from without parsing the file again.
+        """
+        template = DocxTemplate(io.BytesIO(data))
+        template.init_docx()
+        body_xml = template.patch_xml(template.get_xml())
+        body, variables = _compile(body_xml)
+        parts = {}
+        for uri in (DocxTemplate.HEADER_URI, DocxTemplate.FOOTER_URI):
+            for rel_key, part in template.get_headers_footers(uri):
+                xml = template.get_part_xml(part)
+                encoding = template.get_headers_footers_encoding(xml)
+                xml = template.patch_xml(xml)
+                code, part_variables = _compile(xml)
+                parts[rel_key] = (uri, encoding, xml, code)
+                variables |= part_variables
+        return {"body_xml": body_xml, "body": body, "parts": parts, "variables": tuple(sorted(variables))}
+
+    def render(self, context):
+        """
+        Render the template with the given values and return a DocxTemplate ready to be saved.
+        """
+        doc = _PrecompiledDocxTemplate(self)
+        doc.render(context)
+        return doc
+
+
+class _PrecompiledDocxTemplate(DocxTemplate):
+    """
+    DocxTemplate that renders from the Jinja templates held by a CompiledTemplate
+    instead of re-patching and re-compiling the XML on every render.
+    """
+
+    def __init__(self, compiled):
+        super().__init__(io.BytesIO(compiled.data))
+        self.compiled = compiled
+
+    def _finish_xml(self, dst_xml):
+        dst_xml = re.sub(r'\n<w:p([ >])', r'<w:p\1', dst_xml)
+        dst_xml = (dst_xml
+                   .replace('{_{', '{{')
+                   .replace('}_}', '}}')
+                   .replace('{_%', '{%')
+                   .replace('%_}', '%}'))
+        return self.resolve_listing(dst_xml)
+
+    def build_xml(self, context, jinja_env=None):
+        self.current_rendering_part = self.docx._part
+        return self._finish_xml(self.compiled.body.render(context))
+
+    def build_headers_footers_xml(self, context, uri, jinja_env=None):
+        for rel_key, part in self.get_headers_footers(uri):
+            encoding, template = self.compiled.parts[rel_key]
+            self.current_rendering_part = part
+            yield rel_key, self._finish_xml(template.render(context)).encode(encoding)
+
+
+class TemplateCache:
+    """
+    Shared cache of compiled templates, in memory and on disk.
+    Entries are keyed by path + mtime + size and then by content hash,
+    so an edited template is recompiled and identical files share one entry.
+    Least recently used entries are evicted above max_entries or max_bytes.
+    Compiled templates are also saved in folder under their content hash, so
+    a template is parsed only once across application starts and processes;
+    only the max_disk_entries most recently compiled ones are kept there.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=64 * 1024 * 1024, folder=None, max_disk_entries=64):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.folder = Path(folder) if folder else None
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()  # content hash -> CompiledTemplate
+        self._by_stat = {}  # (path, mtime_ns, size) -> content hash
+        self._total_bytes = 0
+        self._compiling = {}  # content hash -> Future of the compile in progress
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the CompiledTemplate for the given .docx path, compiling it on first use.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        stat_key = (str(path), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._by_stat.get(stat_key)
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+
+        # Compiles run outside the lock, so that renders of cached templates don't wait for them;
+        # a thread asking for a template being compiled waits for that compile instead of starting another
+        with self._lock:
+            compiled = self._entries.get(digest)
+            pending = self._compiling.get(digest) if compiled is None else None
+            if compiled is None and pending is None:
+                pending = self._compiling[digest] = Future()
+                compiling = True
+            else:
+                compiling = False
+        if compiling:
+            try:
+                compiled = self._load(path, data, digest) or self._compile(path, data, digest)
+            except BaseException as e:
+                with self._lock:
+                    del self._compiling[digest]
+                pending.set_exception(e)
+                raise
+            with self._lock:
+                self._add(digest, compiled)
+                del self._compiling[digest]
+            pending.set_result(compiled)
+        elif compiled is None:
+            compiled = pending.result()
+
+        with self._lock:
+            # Added again if it was evicted meanwhile
+            self._add(digest, compiled)
+            self._entries.move_to_end(digest)
+            # Forget older stat keys of the same file, they can never match again
+            for key in [k for k in self._by_stat if k[0] == stat_key[0]]:
+                del self._by_stat[key]
+            self._by_stat[stat_key] = digest
+            self._evict()
+            return compiled
+
+    def _add(self, digest, compiled):
+        if digest not in self._entries:
+            self._entries[digest] = compiled
+            self._total_bytes += compiled.size
+
+    def _disk_path(self, digest):
+        return self.folder / f"{digest}-{DISK_CACHE_TAG}.bin"
+
+    def _load(self, path, data, digest):
+        if self.folder is None:
+            return None
+        try:
+            with tracer.span("template.load"):
+                return CompiledTemplate(path, data, digest, marshal.loads(self._disk_path(digest).read_bytes()))
+        except (OSError, ValueError, EOFError, TypeError, KeyError):
+            # Not saved yet, or saved by another version: compile it again
+            return None
+
+    def _compile(self, path, data, digest):
+        with tracer.span("template.compile"):
+            state = CompiledTemplate.compile_state(data)
+            compiled = CompiledTemplate(path, data, digest, state)
+        self._save(digest, state)
+        return compiled
+
+    def _save(self, digest, state):
+        if self.folder is None:
+            return
+        try:
+            write_atomic(self._disk_path(digest), marshal.dumps(state))
+            saved = sorted(self.folder.glob("*.bin"), key=lambda file: file.stat().st_mtime, reverse=True)
+            for file in saved[self.max_disk_entries:]:
+                file.unlink(missing_ok=True)
+        except OSError:
+            pass  # The cache is only an optimization, a read-only folder just disables it
+
+    def render(self, path, context):
+        """
+        Render the template at path with the given values, without copying the file.
+        """
+        return self.get(path).render(context)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_stat.clear()
+            self._total_bytes = 0
+
+    def _evict(self):
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            digest, compiled = self._entries.popitem(last=False)
+            self._total_bytes -= compiled.size
+            for key in [k for k, v in self._by_stat.items() if v == digest]:
+                del self._by_stat[key]
+
+
+# Shared by the contract and invoice generators
+template_cache = TemplateCache(folder=get_cache_folder() / "templates")
@@ -0,0 +1,229 @@
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import functools
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from core.paths import get_cache_folder
+
+log = logging.getLogger(__name__)
+
+# Set to 1 to trace from startup; tracing can also be toggled from the debug panel
+TRACE_ENV_VAR = "CONTRACT_TRACE"
+# Overrides the folder of the trace log, by default a "traces" folder in the cache folder
+TRACE_FOLDER_ENV_VAR = "CONTRACT_TRACE_DIR"
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Tracer:
+    """
+    Span timers around the stages of generation, preview, PDF export and printing.
+    When enabled, each span is written as one JSON line to a rolling log file and
+    its duration is kept in memory for the p50/p95 of its stage. When disabled,
+    a span costs one attribute check. A trace that cannot be written is reported
+    through logging and never fails the traced operation.
+    A single operation can also be profiled: the next span with the requested
+    name runs under cProfile and its statistics are kept until saved.
+    """
+
+    def __init__(self, enabled=False, folder=None, max_bytes=5 * 1024 * 1024, backups=3, samples=1000):
+        self.enabled = enabled
+        self.folder = Path(folder) if folder else get_cache_folder() / "traces"
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.samples = samples
+        self.durations = {}  # stage name -> recent durations in ms
+        self.profile_target = None
+        self.profile = None  # (stage name, pstats.Stats) of the last capture
+        self._profiling = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled and self.profile_target is None:
+            yield
+            return
+
+        profiler = self._start_profile(name)
+        stack = self._stack()
+        stack.append(name)
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            stack.pop()
+            if profiler:
+                self._stop_profile(name, profiler)
+            if self.enabled:
+                try:
+                    self._record(name, started, duration, stack[-1] if stack else None, error, attributes)
+                except Exception:
+                    log.exception("Could not trace the %s span", name)
+
+    def traced(self, name):
+        """
+        Decorator running the whole function in a span.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, started, duration, parent, error, attributes):
+        with self._lock:
+            self.durations.setdefault(name, deque(maxlen=self.samples)).append(duration)
+        entry = {
+            "ts": round(started, 6),
+            "span": name,
+            "ms": round(duration, 3),
+            "parent": parent,
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            entry["error"] = error
+        if attributes:
+            entry["attributes"] = {key: str(value) for key, value in attributes.items()}
+        self._get_logger().info(json.dumps(entry, ensure_ascii=False))
+
+    def _get_logger(self):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    # Worker processes get their own file, rotation is not safe across processes
+                    name = "trace.jsonl" if multiprocessing.parent_process() is None else f"trace-{os.getpid()}.jsonl"
+                    try:
+                        self.folder.mkdir(parents=True, exist_ok=True)
+                        handler = RotatingFileHandler(self.folder / name, maxBytes=self.max_bytes,
+                                                      backupCount=self.backups, encoding="utf-8")
+                    except OSError as e:
+                        # Reported once; the spans are still timed for the debug panel
+                        log.warning("Could not open the trace log in %s: %s", self.folder, e)
+                        handler = logging.NullHandler()
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger = logging.getLogger(f"{__name__}.{id(self)}")
+                    logger.propagate = False
+                    logger.setLevel(logging.INFO)
+                    logger.addHandler(handler)
+                    self._logger = logger
+        return self._logger
+
+    def stats(self):
+        """
+        Return {stage: {"count", "p50", "p95", "max"}} over the recent spans, in ms.
+        """
+        with self._lock:
+            durations = {name: list(values) for name, values in self.durations.items() if values}
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+            }
+            for name, values in sorted(durations.items())
+        }
+
+    def write_summary(self):
+        """
+        Append the per-stage p50/p95 to the log.
+        """
+        stats = self.stats()
+        if stats:
+            self._get_logger().info(json.dumps({"ts": round(time.time(), 6), "summary": stats}))
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+
+    def profile_next(self, name):
+        """
+        Profile the next span called name, or the next top-level span when name is None.
+        """
+        with self._lock:
+            self.profile_target = name or ""
+
+    def _start_profile(self, name):
+        target = self.profile_target
+        if target is None or (target and target != name) or (not target and self._stack()):
+            return None
+        with self._lock:
+            if self._profiling or self.profile_target is None:
+                return None
+            self._profiling = True
+            self.profile_target = None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, name, profiler):
+        profiler.disable()
+        with self._lock:
+            self.profile = (name, pstats.Stats(profiler))
+            self._profiling = False
+
+    def profile_text(self, limit=40):
+        """
+        Return the last captured profile, sorted by cumulative time, as text.
+        """
+        if self.profile is None:
+            return ""
+        name, stats = self.profile
+        stream = io.StringIO()
+        stats.stream = stream
+        stream.write(f"Profile of {name}\n")
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def save_profile(self, path):
+        """
+        Save the last captured profile: as text for a .txt path, in pstats format otherwise.
+        """
+        if self.profile is None:
+            raise RuntimeError("No profile has been captured yet.")
+        path = Path(path)
+        if path.suffix.lower() == ".txt":
+            path.write_text(self.profile_text(limit=None), encoding="utf-8")
+        else:
+            self.profile[1].dump_stats(str(path))
+        return path
+
+
+tracer = Tracer(
+    enabled=os.getenv(TRACE_ENV_VAR, "").lower() in ("1", "true", "yes", "on"),
+    folder=os.getenv(TRACE_FOLDER_ENV_VAR) or None,
+)
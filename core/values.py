@@ -0,0 +1,51 @@
+import datetime
+from decimal import Decimal
+from data.ledger import nonrefundable_cents, to_cents
+
+# Fields typed in the generator forms, in form order
+FORM_FIELDS = ("CLIENT", "VENDOR", "AMOUNT", "LINE1", "LINE2")
+
+
+def add_nonrefundable(values, today):
+    """
+    NONREFUNDABLE: 20% of AMOUNT, as the ledger posts it. Raises ValueError when
+    AMOUNT is not an amount the ledger accepts.
+    """
+    values["NONREFUNDABLE"] = ""
+    # Same parser as the ledger, so a document is only rendered when it can be recorded
+    cents = to_cents(values["AMOUNT"])
+    values["NONREFUNDABLE"] = float(Decimal(nonrefundable_cents(cents)).scaleb(-2))
+
+
+def add_dates(values, today):
+    """
+    TODAY and TODAY_IN_ONE_WEEK, formatted as YYYY-MM-DD.
+    """
+    values["TODAY"] = today.strftime("%Y-%m-%d")
+    values["TODAY_IN_ONE_WEEK"] = (today + datetime.timedelta(days=7)).strftime("%Y-%m-%d")
+
+
+# Computed fields shared by contracts and invoices, applied in order
+COMPUTED_FIELDS = (add_dates, add_nonrefundable)
+
+
+def build_values(fields, computed_fields=COMPUTED_FIELDS, today=None, strict=True):
+    """
+    Build the template values from the form fields and the computed-field hooks.
+    Each hook is called as hook(values, today) and adds its fields to values.
+    Extra fields are kept as-is so they can be used by the template.
+    Raises ValueError when a hook rejects a field, unless strict is False,
+    in which case the hook's fields are left as it set them before failing.
+    """
+    values = {key: "" for key in FORM_FIELDS}
+    values.update(fields)
+
+    today = today or datetime.datetime.today()
+    for hook in computed_fields:
+        try:
+            hook(values, today)
+        except ValueError:
+            if strict:
+                raise
+    return values
+
@@ -0,0 +1,273 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from core.paths import get_data_folder
+from data import ledger, rollups, search
+
+# The package folder is read-only once installed: the database lives with the user's data
+DEFAULT_DB_PATH = get_data_folder() / "contracts.db"
+DB_PATH = DEFAULT_DB_PATH
+# Where it used to be, copied over on first use
+LEGACY_DB_PATH = Path(__file__).parent / "contracts.db"
+
+# Table of each kind of recorded document
+TABLES = {"contract": "contracts", "invoice": "invoices"}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS contracts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client TEXT,
+        vendor TEXT,
+        amount TEXT,
+        line1 TEXT,
+        line2 TEXT,
+        date TEXT
+    );
+
+    -- Newest-first listing of the dashboard walks this index instead of sorting the table
+    CREATE INDEX IF NOT EXISTS idx_contracts_date ON contracts (date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_contracts_vendor ON contracts (vendor, date);
+
+    CREATE TABLE IF NOT EXISTS invoices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client TEXT,
+        vendor TEXT,
+        amount TEXT,
+        line1 TEXT,
+        line2 TEXT,
+        date TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_invoices_vendor ON invoices (vendor, date);
+
+    -- Row counts maintained by triggers so the dashboard never has to COUNT(*) a table
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO counters (name, value) SELECT 'contracts', COUNT(*) FROM contracts;
+    INSERT OR IGNORE INTO counters (name, value) SELECT 'invoices', COUNT(*) FROM invoices;
+
+    CREATE TRIGGER IF NOT EXISTS contracts_count_insert AFTER INSERT ON contracts
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'contracts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS contracts_count_delete AFTER DELETE ON contracts
+    BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = 'contracts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS invoices_count_insert AFTER INSERT ON invoices
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'invoices';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS invoices_count_delete AFTER DELETE ON invoices
+    BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = 'invoices';
+    END;
+"""
+
+# Statements are kept as constants: each connection prepares them once and reuses them from its cache
+INSERT = {
+    table: f"INSERT INTO {table} (client, vendor, amount, line1, line2, date) VALUES (?, ?, ?, ?, ?, ?)"
+    for table in TABLES.values()
+}
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT = 30  # seconds a writer waits for another one to commit
+
+
+def _split_invoices(conn):
+    # Invoices used to be rows of the contracts table, only told apart by their ledger and search entries
+    invoice_ids = (
+        "SELECT contract_id FROM ledger_entries WHERE kind = 'invoice'"
+        " UNION SELECT contract_id FROM search_documents WHERE kind = 'invoice' AND contract_id IS NOT NULL"
+    )
+    search.migrate_documents(conn)
+    # Same ids, so ledger entries, search entries and output store records stay valid
+    conn.execute(f"INSERT INTO invoices SELECT * FROM contracts WHERE id IN ({invoice_ids})")
+    conn.execute(f"DELETE FROM contracts WHERE id IN ({invoice_ids})")
+    # Invoices indexed by the first search backfill were taken for contracts
+    conn.execute("UPDATE search_documents SET kind = 'invoice'"
+                 " WHERE kind = 'contract' AND contract_id IN (SELECT id FROM invoices)")
+    conn.execute("DROP INDEX IF EXISTS idx_ledger_entries_contract")
+
+
+def _build_rollups(conn):
+    # The dashboard rollups of the documents recorded before they existed
+    rollups.rebuild(conn, TABLES)
+
+
+# Schema changes of existing databases, in order; PRAGMA user_version counts the ones applied
+MIGRATIONS = (_split_invoices, _build_rollups)
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_table(kind):
+    try:
+        return TABLES[kind]
+    except KeyError:
+        raise ValueError(f"Unknown document kind: {kind!r}")
+
+
+def _copy_legacy_database(target):
+    source = sqlite3.connect(f"{LEGACY_DB_PATH.as_uri()}?mode=ro", uri=True)
+    partial = target.with_name(f".{target.name}.{os.getpid()}.part")
+    try:
+        copy = sqlite3.connect(partial)
+        with copy:
+            source.backup(copy)
+        copy.close()
+        # Another process may have copied it meanwhile, and already written to it
+        if not target.exists():
+            os.replace(partial, target)
+    finally:
+        source.close()
+        partial.unlink(missing_ok=True)
+
+
+def _open():
+    path = Path(DB_PATH)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path == DEFAULT_DB_PATH and LEGACY_DB_PATH.exists():
+            _copy_legacy_database(path)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS)
+    # Readers see the last committed state and never block the writer, nor the writer them
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def _migrate(conn):
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Read again under the write lock, another process may have migrated meanwhile
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            migration(conn)
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _prepare_schema(conn):
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.executescript(ledger.SCHEMA)
+            conn.executescript(search.SCHEMA)
+            conn.executescript(rollups.schema(TABLES))
+        _migrate(conn)
+        for kind, table in TABLES.items():
+            ledger.backfill(conn, kind, table)
+            search.backfill(conn, kind, table)
+        _schema_ready = True
+
+
+def get_connection():
+    """
+    Return the connection of the current thread to the contracts database,
+    opening it on first use and creating or migrating the schema on first use
+    in this process. Connections are kept open and reused, so their prepared
+    statements are too; use them as context managers for transactions.
+    """
+    key = (os.getpid(), str(DB_PATH))
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != key:
+        # First use in this thread, in a forked process or with another database
+        conn = _local.conn = _open()
+        _local.key = key
+    if not _schema_ready:
+        _prepare_schema(conn)
+    return conn
+
+
+def close_connection():
+    """
+    Close the connection of the current thread, if any.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.key[0] == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+def insert_contract(client, vendor, amount, line1, line2, date, kind="contract", path=None):
+    """
+    Insert a contract (or an invoice, with kind="invoice") with its ledger postings
+    and search entry, and return its id. path is the saved document, if any.
+    """
+    return insert_many([(client, vendor, amount, line1, line2, date)], kind, [path])[0][0]
+
+
+def insert_many(rows, kind="contract", paths=None):
+    """
+    Insert several (client, vendor, amount, line1, line2, date) rows of one kind in a single
+    transaction and return the inserted records as (id, client, vendor, amount, line1, line2, date).
+    paths, if given, are the saved documents of the rows, in the same order.
+    """
+    insert = INSERT[get_table(kind)]
+    paths = paths or [None] * len(rows)
+    # The documents are read before the transaction, which only holds the write lock for the inserts
+    documents = [search.read_document(path) if path else None for path in paths]
+    records = []
+    with get_connection() as conn:
+        for row in rows:
+            records.append((conn.execute(insert, row).lastrowid, *row))
+        ledger.post_contracts(conn, records, kind)
+        for record, document in zip(records, documents):
+            search.index_contract(conn, record, kind, document)
+    return records
+
+
+def get_contracts(kind="contract"):
+    with get_connection() as conn:
+        return conn.execute(f"SELECT * FROM {get_table(kind)} ORDER BY id DESC").fetchall()
+
+
+def get_contracts_page(limit, after=None, kind="contract"):
+    """
+    Return up to limit contracts (or invoices), newest first, using keyset pagination.
+    after is the (date, id) of the last row of the previous page, or None for the first page.
+    """
+    table = get_table(kind)
+    with get_connection() as conn:
+        if after is None:
+            return conn.execute(
+                f"SELECT * FROM {table} ORDER BY date DESC, id DESC LIMIT ?", (limit,)).fetchall()
+        return conn.execute(
+            f"SELECT * FROM {table} WHERE (date, id) < (?, ?) ORDER BY date DESC, id DESC LIMIT ?",
+            (after[0], after[1], limit),
+        ).fetchall()
+
+
+def get_contract_count(kind="contract"):
+    with get_connection() as conn:
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (get_table(kind),)).fetchone()[0]
+
+
+def get_document_paths(kind="contract", date_from=None, date_to=None):
+    """
+    Return the saved files of the contracts (or invoices) dated between date_from and date_to
+    included, either of which may be None, oldest first.
+    """
+    table = get_table(kind)
+    with get_connection() as conn:
+        return [Path(path) for path, in conn.execute(
+            f"SELECT s.path FROM {table} d JOIN search_documents s ON s.kind = ? AND s.contract_id = d.id"
+            f" WHERE d.date >= ? AND d.date <= ? AND s.path IS NOT NULL ORDER BY d.date, d.id",
+            (kind, str(date_from or ""), str(date_to or "9999")),
+        )]
@@ -0,0 +1,231 @@
+import os
+import csv
+from decimal import Decimal
+from pathlib import Path
+from core.output_store import temporary_file
+from data import ledger
+from data.database import TABLES, get_connection, get_table
+
+FORMATS = ("csv", "xlsx", "parquet")
+CHUNK_SIZE = 5000  # rows fetched from the cursor and written at a time
+
+REGISTER_COLUMNS = ("kind", "id", "date", "client", "vendor", "amount", "nonrefundable", "refundable", "line1", "line2")
+TOTALS_COLUMNS = ("vendor", "documents", "amount", "nonrefundable", "refundable")
+MONEY_COLUMNS = ("amount", "nonrefundable", "refundable")
+INTEGER_COLUMNS = ("id", "documents")
+
+
+def get_format(path, format=None):
+    """
+    Return the export format given, or the one of the file extension.
+    """
+    format = (format or Path(path).suffix.lstrip(".")).lower()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format!r} (expected one of {', '.join(FORMATS)})")
+    return format
+
+
+def _kinds(kinds):
+    kinds = list(kinds or TABLES)
+    for kind in kinds:
+        get_table(kind)  # raises ValueError on an unknown kind
+    return kinds
+
+
+def _filters(date_column, vendor_column, date_from=None, date_to=None, vendor=None):
+    # Dates are stored as YYYY-MM-DD, so they compare as text
+    conditions, params = [], []
+    if date_from:
+        conditions.append(f"{date_column} >= ?")
+        params.append(str(date_from))
+    if date_to:
+        conditions.append(f"{date_column} <= ?")
+        params.append(str(date_to))
+    if vendor:
+        conditions.append(f"{vendor_column} = ?")
+        params.append(vendor)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def _money(cents):
+    return None if cents is None else Decimal(cents).scaleb(-2)
+
+
+def count_register(kinds=None, date_from=None, date_to=None, vendor=None):
+    """
+    Return the number of rows export_register() would write.
+    """
+    where, params = _filters("date", "vendor", date_from, date_to, vendor)
+    conn = get_connection()
+    return sum(
+        conn.execute(f"SELECT COUNT(*) FROM {get_table(kind)}{where}", params).fetchone()[0]
+        for kind in _kinds(kinds)
+    )
+
+
+def iter_register(kinds=None, date_from=None, date_to=None, vendor=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the contracts and invoices matching the filters in chunks of at most
+    chunk_size rows, oldest first, as REGISTER_COLUMNS tuples. The amounts are
+    the ledger's, so they are empty for a document whose amount is not a number.
+    """
+    where, params = _filters("d.date", "d.vendor", date_from, date_to, vendor)
+    conn = get_connection()
+    for kind in _kinds(kinds):
+        cursor = conn.execute(
+            f"SELECT ?, d.id, d.date, d.client, d.vendor, r.debit_cents, n.credit_cents,"
+            f" r.debit_cents - n.credit_cents, d.line1, d.line2"
+            f" FROM {get_table(kind)} d"
+            f" LEFT JOIN ledger_entries r ON r.kind = ? AND r.contract_id = d.id AND r.account = ?"
+            f" LEFT JOIN ledger_entries n ON n.kind = ? AND n.contract_id = d.id AND n.account = ?"
+            f"{where} ORDER BY d.date, d.id",
+            (kind, kind, ledger.RECEIVABLES, kind, ledger.NONREFUNDABLE_INCOME, *params),
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [(*row[:5], _money(row[5]), _money(row[6]), _money(row[7]), *row[8:]) for row in rows]
+        finally:
+            cursor.close()
+
+
+def vendor_totals(kinds=None, date_from=None, date_to=None, vendor=None):
+    """
+    Return the totals per vendor of the documents matching the filters, summed
+    by SQLite from the ledger, as TOTALS_COLUMNS tuples.
+    """
+    kinds = _kinds(kinds)
+    where, params = _filters("date", "party", date_from, date_to, vendor)
+    where += (" AND " if where else " WHERE ") + f"kind IN ({', '.join('?' * len(kinds))})"
+    rows = get_connection().execute(
+        "SELECT party,"
+        " SUM(account = ?),"
+        " SUM(CASE WHEN account = ? THEN debit_cents - credit_cents ELSE 0 END),"
+        " SUM(CASE WHEN account = ? THEN credit_cents - debit_cents ELSE 0 END),"
+        " SUM(CASE WHEN account = ? THEN credit_cents - debit_cents ELSE 0 END)"
+        f" FROM ledger_entries{where} GROUP BY party ORDER BY party",
+        (ledger.RECEIVABLES, ledger.RECEIVABLES, ledger.NONREFUNDABLE_INCOME, ledger.REFUNDABLE_DEPOSITS,
+         *params, *kinds),
+    ).fetchall()
+    return [(party, documents, *map(_money, amounts)) for party, documents, *amounts in rows]
+
+
+class CsvWriter:
+    def __init__(self, path, columns, sheet):
+        # utf-8-sig so that Excel reads the accents right
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    def __init__(self, path, columns, sheet):
+        from openpyxl import Workbook
+        self.path = path
+        # Write-only workbooks flush rows to disk as they are appended
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(sheet)
+        self.sheet.append(columns)
+
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetWriter:
+    def __init__(self, path, columns, sheet):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Exporting to Parquet requires the 'pyarrow' package.")
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            (column, pyarrow.decimal128(18, 2) if column in MONEY_COLUMNS
+             else pyarrow.int64() if column in INTEGER_COLUMNS else pyarrow.string())
+            for column in columns
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        # One row group per chunk
+        arrays = [self.pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "parquet": ParquetWriter}
+
+
+def write_export(path, chunks, columns, format=None, sheet="Export", progress=None, should_stop=None):
+    """
+    Write chunks of rows to path, in a temporary file renamed over path once
+    complete. progress, if given, is called with the number of rows written
+    after each chunk. should_stop, if given, is polled between chunks; when it
+    returns True the export is dropped and None is returned.
+    Returns the number of rows written.
+    """
+    path = Path(path)
+    format = get_format(path, format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = temporary_file(path)
+    os.close(descriptor)
+    written = 0
+    try:
+        writer = WRITERS[format](temporary, columns, sheet)
+        try:
+            for rows in chunks:
+                if should_stop and should_stop():
+                    break
+                if not rows:
+                    continue
+                writer.write(rows)
+                written += len(rows)
+                if progress:
+                    progress(written)
+        finally:
+            writer.close()
+        if should_stop and should_stop():
+            os.remove(temporary)
+            return None
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def export_register(path, format=None, kinds=None, date_from=None, date_to=None, vendor=None,
+                    progress=None, should_stop=None):
+    """
+    Export the contracts and invoices matching the filters to a CSV, XLSX or
+    Parquet file, streaming them from the database so memory use does not grow
+    with the number of rows. Returns the number of rows written, or None when stopped.
+    """
+    return write_export(path, iter_register(kinds, date_from, date_to, vendor), REGISTER_COLUMNS,
+                        format, "Register", progress, should_stop)
+
+
+def export_totals(path, format=None, kinds=None, date_from=None, date_to=None, vendor=None):
+    """
+    Export the totals per vendor of the documents matching the filters.
+    Returns the number of vendors written.
+    """
+    return write_export(path, [vendor_totals(kinds, date_from, date_to, vendor)], TOTALS_COLUMNS,
+                        format, "Totals")
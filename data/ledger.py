@@ -0,0 +1,171 @@
+from decimal import Decimal, DecimalException, InvalidOperation, ROUND_HALF_UP
+
+# Share of the amount that is kept whatever happens, same 20% as the NONREFUNDABLE template value
+NONREFUNDABLE_RATE = Decimal("0.2")
+
+# SQLite integers are 64-bit
+MAX_CENTS = 2 ** 63
+
+RECEIVABLES = "Receivables"
+NONREFUNDABLE_INCOME = "Non-refundable income"
+REFUNDABLE_DEPOSITS = "Refundable deposits"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ledger_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        date TEXT,
+        party TEXT,
+        account TEXT NOT NULL,
+        debit_cents INTEGER NOT NULL DEFAULT 0,
+        credit_cents INTEGER NOT NULL DEFAULT 0,
+        balance_cents INTEGER,
+        description TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_ledger_entries_document ON ledger_entries (kind, contract_id);
+    -- Totals over a period or a vendor, for the exports
+    CREATE INDEX IF NOT EXISTS idx_ledger_entries_date ON ledger_entries (date, party);
+    CREATE INDEX IF NOT EXISTS idx_ledger_entries_party ON ledger_entries (party, date);
+
+    -- Running totals per account and startup/vendor, maintained on every posting
+    CREATE TABLE IF NOT EXISTS ledger_balances (
+        account TEXT NOT NULL,
+        party TEXT NOT NULL,
+        debit_cents INTEGER NOT NULL DEFAULT 0,
+        credit_cents INTEGER NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (account, party)
+    );
+
+    CREATE TRIGGER IF NOT EXISTS ledger_entries_balance AFTER INSERT ON ledger_entries
+    BEGIN
+        INSERT INTO ledger_balances (account, party, debit_cents, credit_cents, entry_count)
+        VALUES (NEW.account, COALESCE(NEW.party, ''), NEW.debit_cents, NEW.credit_cents, 1)
+        ON CONFLICT (account, party) DO UPDATE SET
+            debit_cents = debit_cents + excluded.debit_cents,
+            credit_cents = credit_cents + excluded.credit_cents,
+            entry_count = entry_count + 1;
+        UPDATE ledger_entries SET balance_cents = (
+            SELECT debit_cents - credit_cents FROM ledger_balances
+            WHERE account = NEW.account AND party = COALESCE(NEW.party, '')
+        ) WHERE id = NEW.id;
+    END;
+"""
+
+
+INSERT_ENTRY = (
+    "INSERT INTO ledger_entries (contract_id, kind, date, party, account, debit_cents, credit_cents, description)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def to_cents(amount):
+    """
+    Convert an amount typed in the forms ("1500", "1 500,50", 99.9) to integer cents.
+    Raises ValueError when the amount is not a finite number that fits the database.
+    """
+    text = str(amount).strip().replace(" ", "").replace("\u00a0", "").replace(",", ".")
+    try:
+        value = Decimal(text) * 100
+        # nan and inf are Decimals too, and would not fit an INTEGER column either
+        if not value.is_finite() or abs(value) >= MAX_CENTS:
+            raise InvalidOperation
+        return int(value.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except DecimalException:
+        raise ValueError(f"Invalid amount value: {amount!r}")
+
+
+def nonrefundable_cents(cents):
+    """
+    Return the non-refundable share of an amount in cents.
+    """
+    return int((Decimal(cents) * NONREFUNDABLE_RATE).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    if cents is None:
+        return ""
+    return f"{Decimal(cents) / 100:,.2f}".replace(",", " ")
+
+
+def postings(record, kind="contract"):
+    """
+    Return the double-entry postings of a contract or invoice row
+    (id, client, vendor, amount, line1, line2, date): the full amount is owed
+    by the vendor, split between non-refundable income and refundable deposits.
+    Raises ValueError when the amount is not a number.
+    """
+    contract_id, client, vendor, amount, _, _, date = record
+    cents = to_cents(amount)
+    nonrefundable = nonrefundable_cents(cents)
+    description = f"{kind.capitalize()} #{contract_id} - {client}"
+    return [
+        (contract_id, kind, date, vendor, RECEIVABLES, cents, 0, description),
+        (contract_id, kind, date, vendor, NONREFUNDABLE_INCOME, 0, nonrefundable, description),
+        (contract_id, kind, date, vendor, REFUNDABLE_DEPOSITS, 0, cents - nonrefundable, description),
+    ]
+
+
+def post_contracts(conn, records, kind="contract"):
+    """
+    Write the postings of several rows on the given connection, inside the caller's transaction.
+    """
+    conn.executemany(INSERT_ENTRY, [entry for record in records for entry in postings(record, kind)])
+
+
+def backfill(conn, kind="contract", table="contracts"):
+    """
+    Post the rows of table inserted before the ledger existed. Rows whose amount
+    is not a number are skipped. Returns the number of rows posted.
+    """
+    last_posted = conn.execute(
+        "SELECT COALESCE(MAX(contract_id), 0) FROM ledger_entries WHERE kind = ?", (kind,)).fetchone()[0]
+    entries = []
+    for record in conn.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (last_posted,)).fetchall():
+        try:
+            entries.append(postings(record, kind))
+        except ValueError:
+            continue
+    if entries:
+        with conn:
+            conn.executemany(INSERT_ENTRY, [entry for posting in entries for entry in posting])
+    return len(entries)
+
+
+def get_entry_count():
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute("SELECT COALESCE(SUM(entry_count), 0) FROM ledger_balances").fetchone()[0]
+
+
+def get_entries(limit, offset):
+    """
+    Return a page of ledger entries, newest first, as
+    (date, party, account, debit_cents, credit_cents, balance_cents, description).
+    """
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT date, party, account, debit_cents, credit_cents, balance_cents, description"
+            " FROM ledger_entries ORDER BY id DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+
+
+def get_party_balances():
+    """
+    Return the balances per startup/vendor read from the maintained totals, as
+    (party, receivable_cents, nonrefundable_cents, refundable_cents, entry_count).
+    """
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT party,"
+            " SUM(CASE WHEN account = ? THEN debit_cents - credit_cents ELSE 0 END),"
+            " SUM(CASE WHEN account = ? THEN credit_cents - debit_cents ELSE 0 END),"
+            " SUM(CASE WHEN account = ? THEN credit_cents - debit_cents ELSE 0 END),"
+            " SUM(entry_count)"
+            " FROM ledger_balances GROUP BY party ORDER BY party",
+            (RECEIVABLES, NONREFUNDABLE_INCOME, REFUNDABLE_DEPOSITS),
+        ).fetchall()
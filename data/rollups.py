@@ -0,0 +1,150 @@
+import datetime
+from data.ledger import NONREFUNDABLE_INCOME, RECEIVABLES
+
+# Per-day and per-vendor totals of each kind of document, maintained by triggers on every insert,
+# so the dashboard reads a few hundred rows whatever the size of the history
+TABLES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS kpi_daily (
+        kind TEXT NOT NULL,
+        date TEXT NOT NULL,
+        documents INTEGER NOT NULL DEFAULT 0,
+        amount_cents INTEGER NOT NULL DEFAULT 0,
+        nonrefundable_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, date)
+    );
+
+    CREATE TABLE IF NOT EXISTS kpi_vendors (
+        kind TEXT NOT NULL,
+        vendor TEXT NOT NULL,
+        documents INTEGER NOT NULL DEFAULT 0,
+        amount_cents INTEGER NOT NULL DEFAULT 0,
+        nonrefundable_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, vendor)
+    );
+
+    -- Amounts come from the ledger postings, which only exist for amounts that are numbers
+    CREATE TRIGGER IF NOT EXISTS ledger_entries_kpi AFTER INSERT ON ledger_entries
+    WHEN NEW.account IN ('{receivables}', '{nonrefundable}')
+    BEGIN
+        INSERT INTO kpi_daily (kind, date, amount_cents, nonrefundable_cents)
+        VALUES (NEW.kind, COALESCE(NEW.date, ''),
+                CASE WHEN NEW.account = '{receivables}' THEN NEW.debit_cents - NEW.credit_cents ELSE 0 END,
+                CASE WHEN NEW.account = '{nonrefundable}' THEN NEW.credit_cents - NEW.debit_cents ELSE 0 END)
+        ON CONFLICT (kind, date) DO UPDATE SET
+            amount_cents = amount_cents + excluded.amount_cents,
+            nonrefundable_cents = nonrefundable_cents + excluded.nonrefundable_cents;
+        INSERT INTO kpi_vendors (kind, vendor, amount_cents, nonrefundable_cents)
+        VALUES (NEW.kind, COALESCE(NEW.party, ''),
+                CASE WHEN NEW.account = '{receivables}' THEN NEW.debit_cents - NEW.credit_cents ELSE 0 END,
+                CASE WHEN NEW.account = '{nonrefundable}' THEN NEW.credit_cents - NEW.debit_cents ELSE 0 END)
+        ON CONFLICT (kind, vendor) DO UPDATE SET
+            amount_cents = amount_cents + excluded.amount_cents,
+            nonrefundable_cents = nonrefundable_cents + excluded.nonrefundable_cents;
+    END;
+""".format(receivables=RECEIVABLES, nonrefundable=NONREFUNDABLE_INCOME)
+
+DOCUMENT_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS {table}_kpi_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO kpi_daily (kind, date, documents) VALUES ('{kind}', COALESCE(NEW.date, ''), 1)
+        ON CONFLICT (kind, date) DO UPDATE SET documents = documents + 1;
+        INSERT INTO kpi_vendors (kind, vendor, documents) VALUES ('{kind}', COALESCE(NEW.vendor, ''), 1)
+        ON CONFLICT (kind, vendor) DO UPDATE SET documents = documents + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS {table}_kpi_delete AFTER DELETE ON {table}
+    BEGIN
+        UPDATE kpi_daily SET documents = documents - 1 WHERE kind = '{kind}' AND date = COALESCE(OLD.date, '');
+        UPDATE kpi_vendors SET documents = documents - 1 WHERE kind = '{kind}' AND vendor = COALESCE(OLD.vendor, '');
+    END;
+"""
+
+
+def schema(tables):
+    """
+    Return the rollup tables and triggers for tables, a {kind: table} dict.
+    """
+    return TABLES_SCHEMA + "".join(DOCUMENT_TRIGGERS.format(kind=kind, table=table) for kind, table in tables.items())
+
+
+def rebuild(conn, tables):
+    """
+    Recompute the rollups from the documents and their ledger postings, on the
+    given connection, inside the caller's transaction.
+    """
+    conn.execute("DELETE FROM kpi_daily")
+    conn.execute("DELETE FROM kpi_vendors")
+    for kind, table in tables.items():
+        for rollup, key, column in (("kpi_daily", "date", "date"), ("kpi_vendors", "vendor", "vendor")):
+            conn.execute(
+                f"INSERT INTO {rollup} (kind, {key}, documents, amount_cents, nonrefundable_cents)"
+                f" SELECT ?, COALESCE(d.{column}, ''), COUNT(*),"
+                f" COALESCE(SUM(r.debit_cents - r.credit_cents), 0), COALESCE(SUM(n.credit_cents - n.debit_cents), 0)"
+                f" FROM {table} d"
+                f" LEFT JOIN ledger_entries r ON r.kind = ? AND r.contract_id = d.id AND r.account = ?"
+                f" LEFT JOIN ledger_entries n ON n.kind = ? AND n.contract_id = d.id AND n.account = ?"
+                f" GROUP BY COALESCE(d.{column}, '')",
+                (kind, kind, RECEIVABLES, kind, NONREFUNDABLE_INCOME),
+            )
+
+
+def rebuild_rollups():
+    """
+    Recompute the rollups of the contracts database, for instance after rows were
+    imported or fixed by hand. Returns the number of days and of vendors.
+    """
+    from data.database import TABLES, get_connection
+    with get_connection() as conn:
+        rebuild(conn, TABLES)
+        return (conn.execute("SELECT COUNT(*) FROM kpi_daily").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM kpi_vendors").fetchone()[0])
+
+
+def get_totals(kind="contract"):
+    """
+    Return the (documents, amount_cents, nonrefundable_cents) of every document of a kind.
+    """
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT COALESCE(SUM(documents), 0), COALESCE(SUM(amount_cents), 0),"
+            " COALESCE(SUM(nonrefundable_cents), 0) FROM kpi_daily WHERE kind = ?",
+            (kind,),
+        ).fetchone()
+
+
+def get_monthly(kind="contract", months=12, today=None):
+    """
+    Return the (month, documents, amount_cents, nonrefundable_cents) of the last
+    months, oldest first, month as YYYY-MM; months without documents are included.
+    """
+    from data.database import get_connection
+    today = today or datetime.date.today()
+    keys = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    keys.reverse()
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT substr(date, 1, 7), SUM(documents), SUM(amount_cents), SUM(nonrefundable_cents)"
+            " FROM kpi_daily WHERE kind = ? AND date >= ? GROUP BY substr(date, 1, 7)",
+            (kind, keys[0]),
+        ).fetchall()
+    totals = {month: values for month, *values in rows}
+    return [(month, *totals.get(month, (0, 0, 0))) for month in keys]
+
+
+def get_top_vendors(kind="contract", limit=5):
+    """
+    Return the (vendor, documents, amount_cents, nonrefundable_cents) of the vendors
+    with the largest total amount.
+    """
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT vendor, documents, amount_cents, nonrefundable_cents FROM kpi_vendors"
+            " WHERE kind = ? AND documents > 0 ORDER BY amount_cents DESC, vendor LIMIT ?",
+            (kind, limit),
+        ).fetchall()
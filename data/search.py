@@ -0,0 +1,229 @@
+import re
+import datetime
+from pathlib import Path
+
+# One row per indexed contract or invoice, with the file it was saved to when known.
+# contract_id is the id in the table of its kind, contracts or invoices.
+DOCUMENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_id INTEGER,
+        kind TEXT NOT NULL,
+        path TEXT UNIQUE,
+        mtime_ns INTEGER,
+        size INTEGER,
+        UNIQUE (kind, contract_id)
+    )
+"""
+
+SCHEMA = f"""
+    {DOCUMENTS_TABLE};
+
+    -- Full-text index, its rowid is search_documents.id
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        client, vendor, amount, date, line1, line2, body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+"""
+
+# Field names accepted in queries such as "vendor:acme"
+SEARCH_FIELDS = ("client", "vendor", "amount", "date", "line1", "line2", "body")
+
+_TERM = re.compile(r'(\w+):("[^"]*"?|\S+)|("[^"]*"?|\S+)')
+
+
+def build_query(text):
+    """
+    Turn what the user typed into an FTS5 query: every word must match,
+    the last letters typed match as a prefix, and field:value limits a word to one field.
+    Returns None when there is nothing to search for.
+    """
+    terms = []
+    for field, field_value, value in _TERM.findall(text):
+        if field and field.lower() not in SEARCH_FIELDS:
+            # Not a field name, search the whole "word:value" text
+            value, field = f"{field}:{field_value}", ""
+        value = (field_value if field else value).strip('"').replace('"', '""')
+        if not value or not re.search(r"\w", value):
+            continue
+        term = f'"{value}"*'
+        terms.append(f"{field.lower()} : {term}" if field else term)
+    return " AND ".join(terms) or None
+
+
+def _stat(path):
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None, None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_body(path):
+    # lxml is only loaded once a document has to be read
+    from core.preview import docx_to_text
+    try:
+        return docx_to_text(path)
+    except Exception:
+        # Unreadable or not a .docx: index the fields only
+        return ""
+
+
+def _write(conn, document_id, fields, body):
+    conn.execute("DELETE FROM search_index WHERE rowid = ?", (document_id,))
+    conn.execute(
+        "INSERT INTO search_index (rowid, client, vendor, amount, date, line1, line2, body)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (document_id, *fields, body),
+    )
+
+
+def read_document(path):
+    """
+    Return the (path, mtime_ns, size, body) of a saved document for index_contract.
+    Reading the .docx is slow: do it before opening the write transaction.
+    """
+    path = str(Path(path).resolve())
+    return (path, *_stat(path), _read_body(path))
+
+
+def index_contract(conn, record, kind="contract", document=None):
+    """
+    Index a contract or invoice row (id, client, vendor, amount, line1, line2, date)
+    on the given connection, inside the caller's transaction, with the text of
+    the file it was saved to when given as read by read_document.
+    """
+    contract_id, client, vendor, amount, line1, line2, date = record
+    path, mtime_ns, size, body = document or (None, None, None, "")
+    if path is not None:
+        # The file may have been indexed on its own by a rescan, or overwritten by a newer document
+        conn.execute("UPDATE search_documents SET path = NULL WHERE path = ?", (path,))
+    cursor = conn.execute(
+        "INSERT INTO search_documents (contract_id, kind, path, mtime_ns, size) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT (kind, contract_id) DO UPDATE SET path = excluded.path,"
+        " mtime_ns = excluded.mtime_ns, size = excluded.size"
+        " RETURNING id",
+        (contract_id, kind, path, mtime_ns, size),
+    )
+    document_id = cursor.fetchone()[0]
+    _write(conn, document_id, (client, vendor, amount, date, line1, line2), body)
+
+
+def backfill(conn, kind="contract", table="contracts"):
+    """
+    Index the fields of the rows of table inserted before the search index existed.
+    Returns the number of rows indexed.
+    """
+    last_indexed = conn.execute(
+        "SELECT COALESCE(MAX(contract_id), 0) FROM search_documents WHERE kind = ?", (kind,)).fetchone()[0]
+    indexed = 0
+    with conn:
+        for record in conn.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (last_indexed,)).fetchall():
+            index_contract(conn, record, kind)
+            indexed += 1
+    return indexed
+
+
+def migrate_documents(conn):
+    """
+    Rebuild a search_documents table from before invoices had their own table,
+    where contract_id alone was unique, inside the caller's transaction.
+    """
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'search_documents'").fetchone()[0]
+    if "UNIQUE (kind, contract_id)" in sql:
+        return
+    conn.execute("ALTER TABLE search_documents RENAME TO search_documents_old")
+    conn.execute(DOCUMENTS_TABLE)
+    # Same ids, so the rows of search_index still point at their documents
+    conn.execute("INSERT INTO search_documents (id, contract_id, kind, path, mtime_ns, size)"
+                 " SELECT id, contract_id, kind, path, mtime_ns, size FROM search_documents_old")
+    conn.execute("DROP TABLE search_documents_old")
+
+
+def rescan(folders, kinds=None):
+    """
+    Bring the index up to date with the .docx files of the given folders:
+    new files and files whose mtime or size changed are re-read, files that
+    disappeared lose their text. kinds maps a folder to the kind of its documents.
+    Returns (updated, removed) counts.
+    """
+    from data.database import get_connection
+    kinds = {Path(folder).resolve(): kind for folder, kind in (kinds or {}).items()}
+    updated = removed = 0
+    with get_connection() as conn:
+        known = {
+            path: (document_id, mtime_ns, size)
+            for document_id, path, mtime_ns, size in conn.execute(
+                "SELECT id, path, mtime_ns, size FROM search_documents WHERE path IS NOT NULL")
+        }
+        seen = set()
+        for folder in folders:
+            folder = Path(folder).resolve()
+            if not folder.is_dir():
+                continue
+            for path in folder.glob("*.docx"):
+                if path.name.startswith("~$"):
+                    continue  # Word lock file
+                key = str(path)
+                seen.add(key)
+                mtime_ns, size = _stat(path)
+                entry = known.get(key)
+                if entry and entry[1:] == (mtime_ns, size):
+                    continue
+                body = _read_body(path)
+                with conn:
+                    if entry:
+                        document_id = entry[0]
+                        conn.execute("UPDATE search_documents SET mtime_ns = ?, size = ? WHERE id = ?",
+                                     (mtime_ns, size, document_id))
+                        fields = conn.execute(
+                            "SELECT client, vendor, amount, date, line1, line2 FROM search_index WHERE rowid = ?",
+                            (document_id,)).fetchone() or ("", "", "", "", "", "")
+                    else:
+                        # A file not generated by this database: the vendor is in its name
+                        document_id = conn.execute(
+                            "INSERT INTO search_documents (kind, path, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                            (kinds.get(folder, "contract"), key, mtime_ns, size)).lastrowid
+                        date = datetime.date.fromtimestamp(mtime_ns / 1e9).isoformat()
+                        fields = ("", path.stem.rsplit("-", 1)[0], "", date, "", "")
+                    _write(conn, document_id, fields, body)
+                updated += 1
+
+        scanned = [str(Path(folder).resolve()) for folder in folders]
+        with conn:
+            for path, (document_id, _, _) in known.items():
+                if path in seen or str(Path(path).parent) not in scanned:
+                    continue
+                fields = conn.execute(
+                    "SELECT client, vendor, amount, date, line1, line2 FROM search_index WHERE rowid = ?",
+                    (document_id,)).fetchone()
+                contract_id = conn.execute(
+                    "SELECT contract_id FROM search_documents WHERE id = ?", (document_id,)).fetchone()[0]
+                if contract_id is None:
+                    conn.execute("DELETE FROM search_documents WHERE id = ?", (document_id,))
+                    conn.execute("DELETE FROM search_index WHERE rowid = ?", (document_id,))
+                else:
+                    conn.execute("UPDATE search_documents SET path = NULL, mtime_ns = NULL, size = NULL"
+                                 " WHERE id = ?", (document_id,))
+                    _write(conn, document_id, fields, "")
+                removed += 1
+    return updated, removed
+
+
+def search(text, limit=50):
+    """
+    Return up to limit documents matching text, newest first, as
+    (contract_id, kind, client, vendor, amount, date, path, snippet).
+    """
+    query = build_query(text)
+    if query is None:
+        return []
+    from data.database import get_connection
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT d.contract_id, d.kind, s.client, s.vendor, s.amount, s.date, d.path,"
+            " snippet(search_index, -1, '[', ']', '…', 10)"
+            " FROM search_index s JOIN search_documents d ON d.id = s.rowid"
+            " WHERE search_index MATCH ? ORDER BY s.rowid DESC LIMIT ?",
+            (query, limit),
+        ).fetchall()
@@ -0,0 +1,37 @@
+import sys
+import argparse
+import datetime
+from data.database import TABLES
+from data.export import FORMATS, count_register, export_register, export_totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the register of contracts and invoices.")
+    parser.add_argument("output", help="Output file (.csv, .xlsx or .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="Output format (default: from the file extension)")
+    parser.add_argument("--type", choices=sorted(TABLES), help="Only export this document type (default: all)")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, help="Last date, YYYY-MM-DD")
+    parser.add_argument("--vendor", help="Only export the documents of this vendor")
+    parser.add_argument("--totals", action="store_true", help="Export the totals per vendor instead of the documents")
+    args = parser.parse_args(argv)
+
+    filters = dict(kinds=[args.type] if args.type else None, date_from=args.date_from, date_to=args.date_to,
+                   vendor=args.vendor)
+    if args.totals:
+        written = export_totals(args.output, args.format, **filters)
+        print(f"Totals of {written} vendors saved here: {args.output}")
+        return 0
+
+    total = count_register(**filters)
+    written = export_register(
+        args.output, args.format, **filters,
+        progress=lambda done: print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True),
+    )
+    print(file=sys.stderr)
+    print(f"{written} documents saved here: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
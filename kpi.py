@@ -0,0 +1,33 @@
+import sys
+import argparse
+from data.database import TABLES
+from data.ledger import format_cents
+from data.rollups import get_monthly, get_top_vendors, get_totals, rebuild_rollups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the dashboard figures, or rebuild them from the database.")
+    parser.add_argument("--type", choices=sorted(TABLES), default="contract", help="Document type (default: contract)")
+    parser.add_argument("--months", type=int, default=12, help="Number of months shown (default: 12)")
+    parser.add_argument("--top", type=int, default=5, help="Number of vendors shown (default: 5)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute the rollups from the documents first, after an import or a manual fix")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        days, vendors = rebuild_rollups()
+        print(f"Rollups rebuilt: {days} days, {vendors} vendors")
+
+    documents, amount, nonrefundable = get_totals(args.type)
+    print(f"{documents} documents, amount {format_cents(amount)}, non-refundable {format_cents(nonrefundable)}")
+    print()
+    for month, count, month_amount, month_nonrefundable in get_monthly(args.type, args.months):
+        print(f"{month}  {count:>6}  {format_cents(month_amount):>16}  {format_cents(month_nonrefundable):>16}")
+    print()
+    for vendor, count, vendor_amount, _ in get_top_vendors(args.type, args.top):
+        print(f"{vendor:<30}  {count:>6}  {format_cents(vendor_amount):>16}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
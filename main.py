@@ -1,35 +1,129 @@
+import time
+_process_start = time.perf_counter()
+
 import sys
-from PyQt5.QtWidgets import QApplication, QTabWidget, QVBoxLayout, QWidget
+import argparse
+from PyQt5.QtWidgets import QApplication, QTabWidget, QVBoxLayout, QWidget, QShortcut
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import QTimer
 from ui.home import HomeTab
-from ui.contracts import ContractTab
-from ui.accounts import AccountsTab
-from ui.facture import FactureTab
+from widgets.job_queue import JobQueuePanel
+from core.startup_timing import StartupTimer
+from core.tracing import tracer
 
 class MainApp(QWidget):
-    def __init__(self):
+    def __init__(self, timer=None):
         super().__init__()
+        self.timer = timer or StartupTimer(enabled=False)
         self.init_ui()
 
     def init_ui(self):
         layout = QVBoxLayout()
 
-        # Create home tab
-        self.home_tab = HomeTab()
+        # Create home tab, it is the one shown at startup
+        with self.timer.measure("tab Accueil"):
+            self.home_tab = HomeTab()
 
-        # Create tabs
+        # Create tabs; the others are only built the first time they are selected
         self.tabs = QTabWidget()
         self.tabs.addTab(self.home_tab, "Accueil")
-        self.tabs.addTab(ContractTab(self.home_tab), "Contrats")
-        self.tabs.addTab(FactureTab(), "Facture")
-        self.tabs.addTab(AccountsTab(), "Traitement")
+        self.tab_factories = {}
+        for title, factory in (
+            ("Contrats", self.create_contract_tab),
+            ("Facture", self.create_facture_tab),
+            ("Traitement", self.create_accounts_tab),
+        ):
+            index = self.tabs.addTab(QWidget(), title)
+            self.tab_factories[index] = factory
+        self.tabs.currentChanged.connect(self.build_tab)
 
         layout.addWidget(self.tabs)
+
+        # Background document jobs (rendering, PDF export, printing)
+        self.job_queue_panel = JobQueuePanel()
+        layout.addWidget(self.job_queue_panel)
+        # Tracing and profiling panel, built on first use
+        self.debug_panel = None
+        self.debug_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.debug_shortcut.activated.connect(self.show_debug_panel)
+
         self.setLayout(layout)
         self.setWindowTitle('Contract Management System')
         self.resize(1000, 700)
 
+    def build_tab(self, index):
+        """
+        Replace the placeholder of a tab by the real widget on first selection.
+        """
+        factory = self.tab_factories.pop(index, None)
+        if factory is None:
+            return
+
+        title = self.tabs.tabText(index)
+        with self.timer.measure(f"tab {title}"):
+            widget = factory()
+
+        self.tabs.blockSignals(True)
+        placeholder = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, widget, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+
+    def show_debug_panel(self):
+        if self.debug_panel is None:
+            from widgets.debug_panel import DebugPanel
+            self.debug_panel = DebugPanel()
+        self.debug_panel.show()
+        self.debug_panel.raise_()
+
+    def create_contract_tab(self):
+        from ui.contracts import ContractTab
+        self.contract_tab = ContractTab(self.home_tab)
+        return self.contract_tab
+
+    def create_facture_tab(self):
+        from ui.facture import FactureTab
+        self.facture_tab = FactureTab()
+        self.facture_tab.facture_generated.connect(self.home_tab.add_invoice)
+        return self.facture_tab
+
+    def create_accounts_tab(self):
+        from ui.accounts import AccountsTab
+        self.accounts_tab = AccountsTab()
+        return self.accounts_tab
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Contract Management System")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="print import, window and per-tab build times to stderr")
+    parser.add_argument("--startup-target", type=float, metavar="MS",
+                        help="warn when the window takes longer than MS milliseconds to appear")
+    parser.add_argument("--quit-after-startup", action="store_true",
+                        help="exit as soon as the window is shown, to measure cold start from scripts")
+    # Remaining arguments are left to Qt
+    return parser.parse_known_args(argv[1:])
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = MainApp()
+    args, qt_args = parse_args(sys.argv)
+    timer = StartupTimer(enabled=args.startup_timing or args.startup_target is not None, start=_process_start)
+    timer.mark("imports")
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    # Per-stage p50/p95 of the session are appended to the trace log on exit
+    app.aboutToQuit.connect(lambda: tracer.enabled and tracer.write_summary())
+    timer.mark("QApplication")
+
+    window = MainApp(timer)
+    timer.mark("main window")
     window.show()
+
+    def on_first_event_loop_turn():
+        timer.mark("first paint")
+        timer.report(target_ms=args.startup_target)
+        if args.quit_after_startup:
+            app.quit()
+
+    QTimer.singleShot(0, on_first_event_loop_turn)
     sys.exit(app.exec_())
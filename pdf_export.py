@@ -0,0 +1,43 @@
+import sys
+import argparse
+import datetime
+from data.database import TABLES, get_document_paths
+from core.pdf_export import ENGINES, export_pdfs, find_documents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert many contracts or invoices to PDF at once.")
+    parser.add_argument("folder", nargs="?", help="Folder of .docx documents (default: the documents of --from/--to)")
+    parser.add_argument("--type", choices=sorted(TABLES), default="invoice",
+                        help="Document type recorded in the database (default: invoice)")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, help="Last date, YYYY-MM-DD")
+    parser.add_argument("--output", help="Folder of the PDFs (default: next to each document)")
+    parser.add_argument("--workers", type=int, help="Number of converter processes (default: one per CPU)")
+    parser.add_argument("--engine", choices=ENGINES, default="libreoffice",
+                        help="libreoffice (default) renders as Word does; fpdf renders simple documents faster"
+                             " without LibreOffice, with an approximate layout; auto uses fpdf when it can")
+    parser.add_argument("--force", action="store_true", help="Convert again the documents whose PDF is up to date")
+    args = parser.parse_args(argv)
+
+    if args.folder:
+        sources = find_documents(args.folder)
+    elif args.date_from or args.date_to:
+        sources = [path for path in get_document_paths(args.type, args.date_from, args.date_to) if path.exists()]
+    else:
+        parser.error("give a folder or a date range")
+
+    result = export_pdfs(
+        sources, args.output, args.workers, args.engine, args.force,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True),
+    )
+    print(file=sys.stderr)
+    for source, error in result.errors:
+        print(f"{source}: {error}", file=sys.stderr)
+    print(f"{len(result.converted)} converted ({result.fast} without LibreOffice), {len(result.skipped)} up to date,"
+          f" {len(result.errors)} failed in {result.elapsed:.1f} s ({result.throughput:.1f} documents per second)")
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import sys
+import asyncio
+import argparse
+from core.service import GenerationService, HttpServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service generating contracts and invoices.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=1000,
+                        help="Documents accepted at once before requests are refused with 503 (default: 1000)")
+    parser.add_argument("--chunk-size", type=int, default=16,
+                        help="Documents of the same template rendered per worker task (default: 16)")
+    args = parser.parse_args(argv)
+
+    service = GenerationService(workers=args.workers, max_pending=args.max_pending, chunk_size=args.chunk_size)
+    print(f"Listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(HttpServer(service).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,165 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+import datetime
+from pathlib import Path
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView, QTableWidget, QTableWidgetItem, QHeaderView,
+    QAbstractItemView, QSplitter, QLineEdit, QComboBox, QPushButton, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import Qt
+from data import ledger
+from core.tracing import tracer
+from widgets.job_runner import Job, get_job_runner
+from widgets.ledger_table_model import LedgerTableModel
+
+EXPORT_FILTERS = "Excel (*.xlsx);;CSV (*.csv);;Parquet (*.parquet)"
+
+
+def export_register_job(job, path, filters):
+    # Runs on a worker thread: rows are streamed from the database in chunks
+    from data.export import count_register, export_register
+    total = max(count_register(**filters), 1)
+    written = export_register(path, **filters, progress=lambda done: job.report_progress(done * 100 / total),
+                              should_stop=job.is_cancelled)
+    job.check_cancelled()
+    return path, written
+
+
+def export_totals_job(job, path, filters):
+    from data.export import export_totals
+    return path, export_totals(path, **filters)
+
 
 class AccountsTab(QWidget):
     def __init__(self):
         super().__init__()
+        self.init_ui()
+
+    def init_ui(self):
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Tenue des Comptes"))
-        # Ajouter les widgets de comptes ici
+
+        # Export of the register, or of the totals per vendor, over a period
+        export_layout = QHBoxLayout()
+        self.date_from = QLineEdit()
+        self.date_from.setPlaceholderText("From (YYYY-MM-DD)")
+        export_layout.addWidget(self.date_from)
+        self.date_to = QLineEdit()
+        self.date_to.setPlaceholderText("To (YYYY-MM-DD)")
+        export_layout.addWidget(self.date_to)
+        self.vendor_combo = QComboBox()
+        self.vendor_combo.setEditable(True)
+        self.vendor_combo.lineEdit().setPlaceholderText("All vendors")
+        export_layout.addWidget(self.vendor_combo, 1)
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItem("Contracts and invoices", None)
+        self.kind_combo.addItem("Contracts", "contract")
+        self.kind_combo.addItem("Invoices", "invoice")
+        export_layout.addWidget(self.kind_combo)
+        self.export_button = QPushButton("Export register...")
+        self.export_button.clicked.connect(self.export_register)
+        export_layout.addWidget(self.export_button)
+        self.export_totals_button = QPushButton("Export totals...")
+        self.export_totals_button.clicked.connect(self.export_totals)
+        export_layout.addWidget(self.export_totals_button)
+        layout.addLayout(export_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+
+        # Balances per startup/vendor, read from the maintained totals
+        balances = QWidget()
+        balances_layout = QVBoxLayout()
+        balances_layout.setContentsMargins(0, 0, 0, 0)
+        balances_layout.addWidget(QLabel("Balances"))
+        self.balances_table = QTableWidget(0, 5)
+        self.balances_table.setHorizontalHeaderLabels(
+            ["Startup / vendor", "Receivable", "Non-refundable", "Refundable", "Entries"])
+        self.balances_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.balances_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.balances_table.verticalHeader().setVisible(False)
+        balances_layout.addWidget(self.balances_table)
+        balances.setLayout(balances_layout)
+        splitter.addWidget(balances)
+
+        # Journal of all postings, loaded page by page as it is scrolled
+        journal = QWidget()
+        journal_layout = QVBoxLayout()
+        journal_layout.setContentsMargins(0, 0, 0, 0)
+        journal_layout.addWidget(QLabel("Journal"))
+        self.entries_model = LedgerTableModel(self)
+        self.entries_view = QTableView()
+        self.entries_view.setModel(self.entries_model)
+        self.entries_view.verticalHeader().setVisible(False)
+        # Fixed row heights let the view skip measuring rows it does not show
+        self.entries_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.entries_view.horizontalHeader().setStretchLastSection(True)
+        journal_layout.addWidget(self.entries_view)
+        journal.setLayout(journal_layout)
+        splitter.addWidget(journal)
+
+        layout.addWidget(splitter)
         self.setLayout(layout)
+        self.update_balances()
+
+    def update_balances(self):
+        rows = ledger.get_party_balances()
+        self.balances_table.setRowCount(len(rows))
+        for row, (party, receivable, nonrefundable, refundable, entries) in enumerate(rows):
+            self.balances_table.setItem(row, 0, QTableWidgetItem(party))
+            for column, value in enumerate((receivable, nonrefundable, refundable), start=1):
+                item = QTableWidgetItem(ledger.format_cents(value))
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.balances_table.setItem(row, column, item)
+            self.balances_table.setItem(row, 4, QTableWidgetItem(str(entries)))
+        self.update_vendors(rows)
+
+    def update_vendors(self, rows):
+        vendor = self.vendor_combo.currentText()
+        self.vendor_combo.clear()
+        self.vendor_combo.addItems([""] + [party for party, *_ in rows])
+        self.vendor_combo.setCurrentText(vendor)
+
+    def export_filters(self):
+        """
+        Return the filters typed above the balances, or None after showing an error.
+        """
+        dates = []
+        for field in (self.date_from, self.date_to):
+            text = field.text().strip()
+            try:
+                dates.append(datetime.date.fromisoformat(text) if text else None)
+            except ValueError:
+                QMessageBox.critical(self, 'Error', f"Invalid date: {text} (expected YYYY-MM-DD).")
+                return None
+        kind = self.kind_combo.currentData()
+        return dict(kinds=[kind] if kind else None, date_from=dates[0], date_to=dates[1],
+                    vendor=self.vendor_combo.currentText().strip() or None)
+
+    def export_register(self):
+        self.run_export("Export Register", "register.xlsx", export_register_job, "{} documents")
+
+    def export_totals(self):
+        self.run_export("Export Totals", "totals.xlsx", export_totals_job, "Totals of {} vendors")
+
+    def run_export(self, title, default_name, job_function, saved):
+        filters = self.export_filters()
+        if filters is None:
+            return
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, title, default_name, EXPORT_FILTERS)
+        if not file_name:
+            return
+        if not Path(file_name).suffix:
+            # "Excel (*.xlsx)" -> .xlsx
+            file_name += selected_filter[selected_filter.rfind("*") + 1:-1]
+
+        job = Job(f"{title}: {file_name}", job_function, file_name, filters)
+        job.signals.finished.connect(lambda job, result: QMessageBox.information(
+            self, 'Success', f"{saved.format(result[1])} saved here: {result[0]}"))
+        job.signals.failed.connect(
+            lambda job, error: QMessageBox.critical(self, 'Error', f"An error occurred while exporting: {error}"))
+        get_job_runner().submit(job)
+
+    def showEvent(self, event):
+        # The totals are maintained on insert, so refreshing when shown is cheap
+        super().showEvent(event)
+        with tracer.span("accounts.refresh"):
+            self.update_balances()
+            self.entries_model.reload()
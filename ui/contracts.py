@@ -12,7 +12,7 @@ class ContractTab(QWidget):
         
         # Add contract generator widget
         self.contract_generator = ContractGenerator()
-        self.contract_generator.contract_generated.connect(self.home_tab.update_home_tab)  # Connect the signal
+        self.contract_generator.contract_generated.connect(self.home_tab.add_contract)  # Connect the signal
         layout.addWidget(self.contract_generator)
 
         self.setLayout(layout)
@@ -1,7 +1,37 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QListWidget
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListView, QLineEdit, QListWidget, QListWidgetItem
+from PyQt5.QtCore import QTimer, QThreadPool
 import data.database as database
+from data import rollups
+from data.ledger import format_cents
+from core.tracing import tracer
+from widgets.bar_chart import BarChart
+from widgets.contract_list_model import ContractListModel
+from widgets.job_runner import Job
+
+
+def search_job(job, text):
+    # Runs on a worker thread so typing never waits for the database
+    from data import search
+    return search.search(text, limit=HomeTab.SEARCH_LIMIT)
+
+
+def rescan_job(job):
+    # Runs on a worker thread: re-reads only the output files whose mtime or size changed
+    from data import search
+    from core.pipeline import DOCUMENT_TYPES
+    kinds = {document_type.get_folder(): name for name, document_type in DOCUMENT_TYPES.items()}
+    return search.rescan(list(kinds), kinds)
+
 
 class HomeTab(QWidget):
+    RELOAD_DELAY_MS = 500
+    SEARCH_DELAY_MS = 150
+    SEARCH_LIMIT = 100
+    RESCAN_DELAY_MS = 3000
+    RESCAN_INTERVAL_MS = 5 * 60 * 1000
+    KPI_MONTHS = 12
+    TOP_VENDORS = 5
+
     def __init__(self):
         super().__init__()
         self.init_ui()
@@ -13,16 +43,179 @@ class HomeTab(QWidget):
         self.contract_count_label = QLabel()
         layout.addWidget(self.contract_count_label)
 
-        # Recent contracts list
-        self.recent_contracts_list = QListWidget()
-        layout.addWidget(self.recent_contracts_list)
+        # Key figures and charts, read from the rollups only
+        self.kpi_label = QLabel()
+        layout.addWidget(self.kpi_label)
+        charts_layout = QHBoxLayout()
+        self.monthly_chart = BarChart(f"Contracts per month, last {self.KPI_MONTHS} months")
+        charts_layout.addWidget(self.monthly_chart)
+        self.vendors_chart = BarChart(f"Top {self.TOP_VENDORS} vendors by contract amount", horizontal=True)
+        charts_layout.addWidget(self.vendors_chart)
+        layout.addLayout(charts_layout)
+
+        # Search over the fields and text of every contract and invoice
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search contracts and invoices (e.g. acme 2024, vendor:acme)")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.schedule_search)
+        layout.addWidget(self.search_box)
+
+        self.search_results = QListWidget()
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.hide()
+        layout.addWidget(self.search_results)
+
+        # Recent contracts and invoices lists, loaded page by page as the user scrolls
+        self.recent_documents = QWidget()
+        recent_layout = QHBoxLayout()
+        recent_layout.setContentsMargins(0, 0, 0, 0)
+        self.recent_contracts_model = ContractListModel(self)
+        self.recent_contracts_list = QListView()
+        self.recent_contracts_list.setUniformItemSizes(True)
+        self.recent_contracts_list.setModel(self.recent_contracts_model)
+        recent_layout.addWidget(self.recent_contracts_list)
+        self.recent_invoices_model = ContractListModel(self, kind="invoice")
+        self.recent_invoices_list = QListView()
+        self.recent_invoices_list.setUniformItemSizes(True)
+        self.recent_invoices_list.setModel(self.recent_invoices_model)
+        recent_layout.addWidget(self.recent_invoices_list)
+        self.recent_documents.setLayout(recent_layout)
+        layout.addWidget(self.recent_documents)
+
+        # Full reloads are debounced so a burst of them costs a single query
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(self.RELOAD_DELAY_MS)
+        self.reload_timer.timeout.connect(self.update_home_tab)
+        self.kpi_timer = QTimer(self)
+        self.kpi_timer.setSingleShot(True)
+        self.kpi_timer.setInterval(self.RELOAD_DELAY_MS)
+        self.kpi_timer.timeout.connect(self.update_kpis)
+
+        # Searches run shortly after the user stops typing, only the latest one is shown
+        self.search_job = None
+        self.search_jobs = set()  # keeps running searches alive until they finish
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+
+        # Files changed outside the application are picked up in the background
+        self.rescan_job = None
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setInterval(self.RESCAN_INTERVAL_MS)
+        self.rescan_timer.timeout.connect(self.rescan_documents)
+        QTimer.singleShot(self.RESCAN_DELAY_MS, self.rescan_documents)
+        self.rescan_timer.start()
 
         self.setLayout(layout)
         self.update_home_tab()
 
+    @tracer.traced("dashboard.refresh")
     def update_home_tab(self):
-        self.contract_count_label.setText(f"Number of signed contracts: {database.get_contract_count()}")
-        self.recent_contracts_list.clear()
-        contracts = database.get_contracts()
-        for contract in contracts[:10]:
-            self.recent_contracts_list.addItem(f"ID: {contract[0]} - {contract[1]} signed by {contract[2]} on {contract[6]}")
+        self.contract_count = database.get_contract_count()
+        self.invoice_count = database.get_contract_count("invoice")
+        self.update_count_label()
+        self.update_kpis()
+        self.recent_contracts_model.reload()
+        self.recent_invoices_model.reload()
+
+    def update_count_label(self):
+        self.contract_count_label.setText(
+            f"Number of signed contracts: {self.contract_count}  |  Number of invoices: {self.invoice_count}")
+
+    def kpi_text(self, kind, months):
+        _, amount, nonrefundable = rollups.get_totals(kind)
+        _, month_count, month_amount, _ = months[-1]
+        return (f"This month: {month_count} {kind}s, {format_cents(month_amount)}"
+                f"  |  Total amount: {format_cents(amount)}  |  Non-refundable: {format_cents(nonrefundable)}")
+
+    def update_kpis(self):
+        # The charts are about contracts, the key figures cover invoices too
+        months = rollups.get_monthly(months=self.KPI_MONTHS)
+        invoice_months = rollups.get_monthly("invoice", months=self.KPI_MONTHS)
+        self.kpi_label.setText(
+            f"Contracts - {self.kpi_text('contract', months)}\n"
+            f"Invoices - {self.kpi_text('invoice', invoice_months)}")
+        # "2024-05" -> "05/24"
+        self.monthly_chart.set_bars(
+            (f"{month[5:]}/{month[2:4]}", count, f"{count} contracts, {format_cents(month_amount)}")
+            for month, count, month_amount, _ in months)
+        self.vendors_chart.set_bars(
+            (vendor or "(none)", vendor_amount, format_cents(vendor_amount))
+            for vendor, _, vendor_amount, _ in rollups.get_top_vendors(limit=self.TOP_VENDORS))
+
+    def add_contract(self, record):
+        """
+        Show a contract that has just been inserted, without reloading the list.
+        """
+        self.contract_count += 1
+        self.update_count_label()
+        self.kpi_timer.start()
+        if not self.recent_contracts_model.prepend(record):
+            self.schedule_reload()
+        if self.search_box.text().strip():
+            self.schedule_search()
+
+    def add_invoice(self, record):
+        """
+        Show an invoice that has just been inserted, without reloading the list.
+        """
+        self.invoice_count += 1
+        self.update_count_label()
+        self.kpi_timer.start()
+        if not self.recent_invoices_model.prepend(record):
+            self.schedule_reload()
+        if self.search_box.text().strip():
+            self.schedule_search()
+
+    def schedule_reload(self):
+        self.reload_timer.start()
+
+    def schedule_search(self):
+        searching = bool(self.search_box.text().strip())
+        self.search_results.setVisible(searching)
+        self.recent_documents.setVisible(not searching)
+        if searching:
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.search_job = None
+            self.search_results.clear()
+
+    def run_search(self):
+        job = Job("Search", search_job, self.search_box.text())
+        job.signals.finished.connect(self.on_search_finished)
+        job.signals.failed.connect(lambda job, error: self.search_jobs.discard(job))
+        self.search_job = job
+        self.search_jobs.add(job)
+        QThreadPool.globalInstance().start(job)
+
+    def on_search_finished(self, job, results):
+        self.search_jobs.discard(job)
+        if job is not self.search_job:
+            return
+
+        self.search_results.clear()
+        if not results:
+            self.search_results.addItem("No matching contracts or invoices.")
+            return
+        for contract_id, kind, client, vendor, amount, date, path, snippet in results:
+            title = f"ID: {contract_id}" if contract_id is not None else "File"
+            item = QListWidgetItem(f"{title} - {kind} - {client} / {vendor} - {amount} on {date}\n    {' '.join(snippet.split())}")
+            if path:
+                item.setToolTip(path)
+            self.search_results.addItem(item)
+
+    def rescan_documents(self):
+        if self.rescan_job is not None:
+            return
+        self.rescan_job = Job("Search index rescan", rescan_job)
+        self.rescan_job.signals.finished.connect(self.on_rescan_finished)
+        self.rescan_job.signals.failed.connect(self.on_rescan_finished)
+        QThreadPool.globalInstance().start(self.rescan_job)
+
+    def on_rescan_finished(self, job, result):
+        self.rescan_job = None
+        if isinstance(result, tuple) and any(result) and self.search_box.text().strip():
+            self.schedule_search()
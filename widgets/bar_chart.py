@@ -0,0 +1,64 @@
+import math
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QPainter, QColor
+from PyQt5.QtCore import Qt, QRectF
+
+
+class BarChart(QWidget):
+    """
+    Small bar chart painted directly, vertical bars under a title, or horizontal
+    ones with their labels for rankings. Values are given already formatted for the tooltips.
+    """
+
+    def __init__(self, title, horizontal=False, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.horizontal = horizontal
+        self.bars = []  # (label, value, text)
+        self.color = QColor(70, 130, 180)
+        self.setMinimumHeight(120)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_bars(self, bars):
+        self.bars = list(bars)
+        self.setToolTip("\n".join(f"{label}: {text}" for label, _, text in self.bars))
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        metrics = painter.fontMetrics()
+        line = metrics.height()
+        painter.drawText(0, 0, self.width(), line, Qt.AlignLeft, self.title)
+        area = QRectF(0, line + 4, self.width(), self.height() - line - 4)
+        largest = max((value for _, value, _ in self.bars), default=0)
+        if not self.bars or largest <= 0:
+            painter.drawText(area, Qt.AlignCenter, "No data")
+            return
+
+        if self.horizontal:
+            label_width = min(max(metrics.width(label) for label, _, _ in self.bars) + 12, area.width() / 2)
+            text_width = max(metrics.width(text) for _, _, text in self.bars) + 6
+            height = min(area.height() / len(self.bars), line + 6)
+            for index, (label, value, text) in enumerate(self.bars):
+                top = area.top() + index * height
+                painter.drawText(QRectF(0, top, label_width - 6, height), Qt.AlignRight | Qt.AlignVCenter,
+                                 metrics.elidedText(label, Qt.ElideRight, int(label_width - 6)))
+                width = (area.width() - label_width - text_width) * value / largest
+                painter.fillRect(QRectF(label_width, top + 2, width, height - 4), self.color)
+                painter.drawText(QRectF(label_width + width + 4, top, text_width, height),
+                                 Qt.AlignLeft | Qt.AlignVCenter, text)
+            return
+
+        # Vertical bars; when the labels are wider than the bars, only every few bars from the last one is labelled
+        width = area.width() / len(self.bars)
+        bottom = area.bottom() - line
+        step = math.ceil((max(metrics.width(label) for label, _, _ in self.bars) + 6) / width)
+        for index, (label, value, _) in enumerate(self.bars):
+            left = area.left() + index * width
+            height = (bottom - area.top()) * value / largest
+            painter.fillRect(QRectF(left + 2, bottom - height, width - 4, height), self.color)
+            if (len(self.bars) - 1 - index) % step == 0:
+                label_width = metrics.width(label) + 6
+                label_left = min(max(left + (width - label_width) / 2, area.left()), area.right() - label_width)
+                painter.drawText(QRectF(label_left, bottom, label_width, line), Qt.AlignCenter, label)
@@ -0,0 +1,74 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+import data.database as database
+
+
+class ContractListModel(QAbstractListModel):
+    """
+    List model over the contracts table (or the invoices one, with kind="invoice"), newest first.
+    Rows are fetched one page at a time as the view scrolls, so a refresh
+    only costs one small indexed query whatever the size of the table.
+    """
+    PAGE_SIZE = 50
+
+    def __init__(self, parent=None, kind="contract"):
+        super().__init__(parent)
+        self.kind = kind
+        self.contracts = []
+        self.has_more = True
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.contracts)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        contract = self.contracts[index.row()]
+        if self.kind == "invoice":
+            return f"ID: {contract[0]} - {contract[1]} invoiced to {contract[2]} on {contract[6]}"
+        return f"ID: {contract[0]} - {contract[1]} signed by {contract[2]} on {contract[6]}"
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        after = (self.contracts[-1][6], self.contracts[-1][0]) if self.contracts else None
+        page = database.get_contracts_page(self.PAGE_SIZE, after, self.kind)
+        self.has_more = len(page) == self.PAGE_SIZE
+        if not page:
+            return
+        first = len(self.contracts)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.contracts.extend(page)
+        self.endInsertRows()
+
+    def prepend(self, contract):
+        """
+        Insert a newly created contract at the top of the list.
+        Returns False when the row does not belong at the top and a reload is needed.
+        """
+        if not self.contracts:
+            # Nothing fetched yet: the first page will contain the new row
+            return self.has_more or self._insert_first(contract)
+        top = self.contracts[0]
+        if (contract[6], contract[0]) < (top[6], top[0]):
+            return False
+        return self._insert_first(contract)
+
+    def _insert_first(self, contract):
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.contracts.insert(0, contract)
+        self.endInsertRows()
+        return True
+
+    def reload(self):
+        """
+        Drop the loaded pages; the view fetches the first page again on demand.
+        """
+        self.beginResetModel()
+        self.contracts = []
+        self.has_more = True
+        self.endResetModel()
@@ -0,0 +1,127 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox, QComboBox, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QPlainTextEdit, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer
+from core.tracing import tracer
+
+NEXT_OPERATION = "(next operation)"
+STAGES = [
+    NEXT_OPERATION, "generate", "render", "save", "database.insert", "template.compile", "template.load",
+    "preview.html", "preview.live", "pdf.convert", "pdf.export", "print", "batch", "dashboard.refresh", "accounts.refresh",
+]
+
+
+class DebugPanel(QWidget):
+    """
+    Tracing switch, per-stage timings and single-operation profiling.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.init_ui()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.update_stats)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        self.tracing_checkbox = QCheckBox("Enable tracing")
+        self.tracing_checkbox.setChecked(tracer.enabled)
+        self.tracing_checkbox.toggled.connect(tracer.set_enabled)
+        layout.addWidget(self.tracing_checkbox)
+        layout.addWidget(QLabel(f"Trace log: {tracer.folder}"))
+
+        self.stats_table = QTableWidget(0, 5)
+        self.stats_table.setHorizontalHeaderLabels(["Stage", "Count", "p50 (ms)", "p95 (ms)", "Max (ms)"])
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stats_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stats_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.stats_table)
+
+        stats_buttons = QHBoxLayout()
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.reset_stats)
+        stats_buttons.addWidget(self.reset_button)
+        self.summary_button = QPushButton("Write summary to log")
+        self.summary_button.clicked.connect(tracer.write_summary)
+        stats_buttons.addWidget(self.summary_button)
+        stats_buttons.addStretch()
+        layout.addLayout(stats_buttons)
+
+        # cProfile capture of one operation
+        profile_buttons = QHBoxLayout()
+        profile_buttons.addWidget(QLabel("Profile:"))
+        self.stage_combo = QComboBox()
+        self.stage_combo.setEditable(True)
+        self.stage_combo.addItems(STAGES)
+        profile_buttons.addWidget(self.stage_combo, 1)
+        self.profile_button = QPushButton("Profile next")
+        self.profile_button.clicked.connect(self.profile_next)
+        profile_buttons.addWidget(self.profile_button)
+        self.save_profile_button = QPushButton("Save profile...")
+        self.save_profile_button.clicked.connect(self.save_profile)
+        profile_buttons.addWidget(self.save_profile_button)
+        layout.addLayout(profile_buttons)
+
+        self.profile_status = QLabel("No profile captured.")
+        layout.addWidget(self.profile_status)
+        self.profile_text = QPlainTextEdit()
+        self.profile_text.setReadOnly(True)
+        self.profile_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        layout.addWidget(self.profile_text)
+
+        self.setLayout(layout)
+        self.setWindowTitle('Debug')
+        self.resize(700, 600)
+
+    def update_stats(self):
+        stats = tracer.stats()
+        self.stats_table.setRowCount(len(stats))
+        for row, (name, stage) in enumerate(stats.items()):
+            self.stats_table.setItem(row, 0, QTableWidgetItem(name))
+            self.stats_table.setItem(row, 1, QTableWidgetItem(str(stage["count"])))
+            for column, key in enumerate(("p50", "p95", "max"), start=2):
+                item = QTableWidgetItem(f"{stage[key]:.1f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.stats_table.setItem(row, column, item)
+
+        if self.profile_button.isEnabled() is False and tracer.profile_target is None:
+            # The requested operation has run
+            self.profile_button.setEnabled(True)
+            if tracer.profile is not None:
+                self.profile_status.setText(f"Captured: {tracer.profile[0]}")
+                self.profile_text.setPlainText(tracer.profile_text())
+
+    def reset_stats(self):
+        tracer.reset()
+        self.update_stats()
+
+    def profile_next(self):
+        stage = self.stage_combo.currentText().strip()
+        tracer.profile_next(None if stage == NEXT_OPERATION else stage)
+        self.profile_button.setEnabled(False)
+        self.profile_status.setText(f"Waiting for {stage}...")
+
+    def save_profile(self):
+        if tracer.profile is None:
+            QMessageBox.critical(self, 'Error', 'No profile captured.')
+            return
+
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Save Profile", f"{tracer.profile[0]}.prof", "Profile (*.prof);;Text (*.txt)")
+        if file_name:
+            try:
+                tracer.save_profile(file_name)
+            except Exception as e:
+                QMessageBox.critical(self, 'Error', f"An error occurred while saving the profile: {e}")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_stats()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
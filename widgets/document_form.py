@@ -0,0 +1,318 @@
+import os
+import sys
+from pathlib import Path
+from PyQt5.QtWidgets import (
+    QWidget, QFormLayout, QLineEdit, QPushButton, QFileDialog, QMessageBox, QTextBrowser, QVBoxLayout, QCheckBox
+)
+from PyQt5.QtCore import pyqtSignal, QTimer, QThreadPool
+from core.pipeline import GenerationCancelled
+from core.values import FORM_FIELDS
+from core.preview import preview_cache
+from core.pdf_converter import convert_to_pdf
+from widgets.job_runner import Job, JobCancelled, get_job_runner
+
+FIELD_LABELS = {
+    "CLIENT": "Client name:",
+    "VENDOR": "Vendor name:",
+    "AMOUNT": "Amount:",
+    "LINE1": "Description1:",
+    "LINE2": "Description2:",
+}
+
+
+def generate_document_job(job, pipeline, template_path, values):
+    # Runs on a worker thread: render, save and record the document
+    try:
+        document = pipeline.render_and_write(template_path, values,
+                                             progress=job.report_progress, should_stop=job.is_cancelled)
+    except GenerationCancelled:
+        raise JobCancelled()
+    # A document found in the output store is already in the database
+    return document.path, None if document.reused else document.record
+
+
+def render_live_preview_job(job, pipeline, template_path, fields):
+    # Runs on a worker thread: fills the cached template in memory only, nothing is saved
+    return pipeline.preview(template_path, fields)
+
+
+def convert_to_pdf_job(job, docx_path, output_folder):
+    # Runs on a worker thread: the conversion itself is queued on the warm LibreOffice workers
+    pdf_path = convert_to_pdf(docx_path, output_folder, should_stop=job.is_cancelled)
+    job.check_cancelled()
+    return pdf_path
+
+
+# Progress shown in the job queue for each state of a print request
+PRINT_PROGRESS = {"Queued": 0, "Converting": 25, "Sent": 75}
+
+
+def print_job(job, paths, title=None):
+    # Runs on a worker thread: follows the request through the print spooler until the printer is done
+    from core.print_spooler import CANCELLED, FAILED, get_spooler
+    spooler = get_spooler()
+    request = spooler.submit(paths, title)
+    while not request.wait(0.2):
+        if job.is_cancelled():
+            spooler.cancel(request)
+        job.report_progress(PRINT_PROGRESS.get(request.status, 0))
+    if request.status == CANCELLED:
+        raise JobCancelled()
+    if request.status == FAILED:
+        raise RuntimeError(request.error)
+    return request
+
+
+class DocumentForm(QWidget):
+    """
+    Form front-end over a DocumentPipeline: the fields are typed here, the
+    documents are generated, previewed, printed and exported by background jobs.
+    """
+    document_generated = pyqtSignal(object)  # Signal carrying the inserted database row
+    CLEAR_AFTER_GENERATE = False
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+        self.label = pipeline.document_type.label
+        self.output_folder = pipeline.document_type.get_folder()
+        self.init_ui()
+
+    def init_ui(self):
+        # Define layout
+        layout = QVBoxLayout()
+
+        # Create a form layout for inputs
+        self.form_layout = form_layout = QFormLayout()
+
+        # One line edit per field, rebuilt from the placeholders of the selected template
+        self.fields_layout = QFormLayout()
+        self.fields_layout.setContentsMargins(0, 0, 0, 0)
+        form_layout.addRow(self.fields_layout)
+        self.fields = {}  # field name -> QLineEdit
+        self.set_form_fields(FORM_FIELDS)
+
+        self.select_template_button = QPushButton(f"Select {self.label} Template")
+        self.select_template_button.clicked.connect(self.select_template)
+        form_layout.addWidget(self.select_template_button)
+
+        self.generate_button = QPushButton(f"Generate {self.label}")
+        self.generate_button.clicked.connect(self.generate_document)
+        form_layout.addWidget(self.generate_button)
+
+        self.preview_button = QPushButton(f"Preview {self.label}")
+        self.preview_button.clicked.connect(self.preview_document)
+        form_layout.addWidget(self.preview_button)
+
+        self.live_preview_checkbox = QCheckBox("Live preview")
+        self.live_preview_checkbox.toggled.connect(self.schedule_live_preview)
+        form_layout.addWidget(self.live_preview_checkbox)
+
+        self.open_button = QPushButton("Open in Word")
+        self.open_button.clicked.connect(self.open_in_word)
+        form_layout.addWidget(self.open_button)
+
+        self.print_button = QPushButton(f"Print {self.label}")
+        self.print_button.clicked.connect(self.print_document)
+        form_layout.addWidget(self.print_button)
+
+        self.print_several_button = QPushButton(f"Print Several {self.label}s...")
+        self.print_several_button.clicked.connect(self.print_several)
+        form_layout.addWidget(self.print_several_button)
+
+        self.save_pdf_button = QPushButton("Save as PDF")
+        self.save_pdf_button.clicked.connect(self.save_as_pdf)
+        form_layout.addWidget(self.save_pdf_button)
+
+        # Add the form layout to the main layout
+        layout.addLayout(form_layout)
+
+        # Create a text browser for template preview
+        self.preview_browser = QTextBrowser()
+        layout.addWidget(self.preview_browser)
+
+        self.setLayout(layout)
+        self.setWindowTitle(f'{self.label} Generator')
+        self.resize(800, 600)  # Set the window size (width, height)
+
+        # Initialize template path and output path
+        self.template_path = None
+        self.output_path = None
+
+        # Re-render the live preview shortly after the user stops typing
+        self.live_preview_job = None
+        self.live_preview_jobs = set()  # keeps running renders alive until they finish
+        self.live_preview_timer = QTimer(self)
+        self.live_preview_timer.setSingleShot(True)
+        self.live_preview_timer.setInterval(250)
+        self.live_preview_timer.timeout.connect(self.update_live_preview)
+
+    def set_form_fields(self, names):
+        """
+        Show one line edit per field name, keeping what was typed in the fields that remain.
+        """
+        typed = self.form_fields()
+        while self.fields_layout.rowCount():
+            self.fields_layout.removeRow(0)
+        self.fields = {}
+        for name in names:
+            field = QLineEdit(typed.get(name, ""))
+            field.textChanged.connect(self.schedule_live_preview)
+            self.fields_layout.addRow(FIELD_LABELS.get(name, f"{name}:"), field)
+            self.fields[name] = field
+
+    def form_fields(self):
+        return {name: field.text() for name, field in self.fields.items()}
+
+    def clear_form_fields(self):
+        for field in self.fields.values():
+            field.clear()
+
+    def select_template(self):
+        # Open file dialog to select the template
+        file_name, _ = QFileDialog.getOpenFileName(
+            self, f"Select {self.label} Template", "", "Word Documents (*.docx)")
+        if not file_name:
+            return
+
+        try:
+            # Compiled once here, generation and previews then reuse it
+            check = self.pipeline.check_template(file_name)
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f"This file cannot be used as a template: {e}")
+            return
+
+        self.template_path = Path(file_name)
+        self.set_form_fields(check.form_fields)
+        # Display a preview of the selected template
+        self.preview_template()
+        self.schedule_live_preview()
+        if check.problems():
+            QMessageBox.warning(self, 'Template Selected', f"Template selected: {self.template_path}\n\n{check.summary()}")
+        else:
+            QMessageBox.information(self, 'Template Selected',
+                                    f"Template selected: {self.template_path}\n\n{check.summary()}".strip())
+
+    def preview_template(self):
+        if not self.template_path:
+            return
+
+        try:
+            # Render the template as HTML, cached per file content
+            self.preview_browser.setHtml(preview_cache.get_html(self.template_path))
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f"An error occurred while previewing the template: {e}")
+
+    def generate_document(self):
+        if not self.template_path:
+            QMessageBox.critical(self, 'Error', 'No template selected.')
+            return
+
+        # Add the computed fields (NONREFUNDABLE, TODAY, ...) before leaving the GUI thread
+        try:
+            values = self.pipeline.build_values(self.form_fields())
+        except ValueError:
+            QMessageBox.critical(self, 'Error', 'Invalid amount value.')
+            return
+
+        # Render, save and record the document in the background so the form stays usable
+        job = Job(f"{self.label}: {self.pipeline.document_type.get_filename(values)}", generate_document_job,
+                  self.pipeline, self.template_path, values)
+        job.signals.finished.connect(self.on_document_generated)
+        job.signals.failed.connect(lambda job, error: QMessageBox.critical(self, 'Error', f"An error occurred: {error}"))
+        get_job_runner().submit(job)
+
+        if self.CLEAR_AFTER_GENERATE:
+            # Clear form fields so the next document can be typed while this one is produced
+            self.clear_form_fields()
+
+    def on_document_generated(self, job, result):
+        self.output_path, record = result
+
+        # Emit signal that a document has been generated
+        if record is not None:
+            self.document_generated.emit(record)
+
+        # Preview the generated document
+        self.preview_document()
+
+    def schedule_live_preview(self):
+        if self.live_preview_checkbox.isChecked() and self.template_path:
+            self.live_preview_timer.start()
+
+    def update_live_preview(self):
+        # Preview renders stay off the job queue panel, only the latest one is shown
+        job = Job("Live preview", render_live_preview_job, self.pipeline, self.template_path, self.form_fields())
+        job.signals.finished.connect(self.on_live_preview_rendered)
+        job.signals.failed.connect(lambda job, error: self.live_preview_jobs.discard(job))
+        self.live_preview_job = job
+        self.live_preview_jobs.add(job)
+        QThreadPool.globalInstance().start(job)
+
+    def on_live_preview_rendered(self, job, html):
+        self.live_preview_jobs.discard(job)
+        if job is self.live_preview_job and self.live_preview_checkbox.isChecked():
+            self.preview_browser.setHtml(html)
+
+    def preview_document(self):
+        if not self.output_path:
+            QMessageBox.critical(self, 'Error', f'No {self.label.lower()} created.')
+            return
+
+        try:
+            # Render the generated document as HTML, cached per file content
+            self.preview_browser.setHtml(preview_cache.get_html(self.output_path))
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f"An error occurred while previewing the {self.label.lower()}: {e}")
+
+    def open_in_word(self):
+        if not self.output_path:
+            QMessageBox.critical(self, 'Error', f'No {self.label.lower()} created.')
+            return
+
+        try:
+            # Open the document with the default Word application
+            if sys.platform == "win32":
+                os.startfile(self.output_path)
+            elif sys.platform == "darwin":
+                os.system(f'open "{self.output_path}"')
+            else:  # Linux and other Unix-like OS
+                os.system(f'xdg-open "{self.output_path}"')
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f"An error occurred while opening the file: {e}")
+
+    def print_document(self):
+        if not self.output_path:
+            QMessageBox.critical(self, 'Error', f'No {self.label.lower()} created.')
+            return
+
+        self.print_documents([self.output_path])
+
+    def print_several(self):
+        file_names, _ = QFileDialog.getOpenFileNames(
+            self, f"Select {self.label}s to Print", str(self.output_folder), "Documents (*.docx *.pdf)")
+        if file_names:
+            self.print_documents(file_names)
+
+    def print_documents(self, paths):
+        """
+        Send documents to the print spooler as one request, followed in the job queue.
+        """
+        title = Path(paths[0]).name if len(paths) == 1 else f"{len(paths)} {self.label.lower()}s"
+        job = Job(f"Print: {title}", print_job, paths, title)
+        job.signals.failed.connect(
+            lambda job, error: QMessageBox.critical(self, 'Error', f"An error occurred while printing: {error}"))
+        get_job_runner().submit(job)
+
+    def save_as_pdf(self):
+        if not self.output_path:
+            QMessageBox.critical(self, 'Error', f'No {self.label.lower()} created.')
+            return
+
+        job = Job(f"PDF: {Path(self.output_path).name}", convert_to_pdf_job,
+                  self.output_path, self.output_folder)
+        job.signals.finished.connect(
+            lambda job, pdf_path: QMessageBox.information(self, 'Success', f"File saved as PDF here: {pdf_path}"))
+        job.signals.failed.connect(
+            lambda job, error: QMessageBox.critical(self, 'Error', f"An error occurred while saving as PDF: {error}"))
+        get_job_runner().submit(job)
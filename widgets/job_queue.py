@@ -0,0 +1,90 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QProgressBar,
+    QHeaderView, QAbstractItemView
+)
+from widgets.job_runner import Job, get_job_runner
+
+
+class JobQueuePanel(QWidget):
+    """
+    Small panel listing the background document jobs with their status and progress.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.runner = get_job_runner()
+        self.jobs = []  # one job per table row
+        self.init_ui()
+        self.runner.job_added.connect(self.add_job)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(QLabel("Jobs"))
+        header_layout.addStretch()
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        header_layout.addWidget(self.cancel_button)
+
+        self.clear_button = QPushButton("Clear finished")
+        self.clear_button.clicked.connect(self.clear_finished)
+        header_layout.addWidget(self.clear_button)
+        layout.addLayout(header_layout)
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Job", "Status", "Progress"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.setLayout(layout)
+        self.setMaximumHeight(160)
+
+    def add_job(self, job):
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, QTableWidgetItem(job.title))
+        self.table.setItem(row, 1, QTableWidgetItem(job.status))
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 100)
+        self.table.setCellWidget(row, 2, progress_bar)
+        self.jobs.append(job)
+        self.table.scrollToBottom()
+
+        job.signals.started.connect(self.update_status)
+        job.signals.progress.connect(self.update_progress)
+        job.signals.finished.connect(self.update_status)
+        job.signals.failed.connect(self.show_error)
+        job.signals.cancelled.connect(self.update_status)
+
+    def update_status(self, job, *args):
+        if job in self.jobs:
+            row = self.jobs.index(job)
+            self.table.item(row, 1).setText(job.status)
+
+    def update_progress(self, job, percent):
+        if job in self.jobs:
+            row = self.jobs.index(job)
+            self.table.cellWidget(row, 2).setValue(percent)
+
+    def show_error(self, job, error):
+        if job in self.jobs:
+            row = self.jobs.index(job)
+            self.table.item(row, 1).setText(job.status)
+            self.table.item(row, 1).setToolTip(error)
+
+    def cancel_selected(self):
+        for index in self.table.selectionModel().selectedRows():
+            self.runner.cancel(self.jobs[index.row()])
+
+    def clear_finished(self):
+        self.runner.remove_finished()
+        for row in reversed(range(len(self.jobs))):
+            if self.jobs[row].status not in (Job.PENDING, Job.RUNNING):
+                self.table.removeRow(row)
+                del self.jobs[row]
@@ -0,0 +1,151 @@
+import threading
+import subprocess
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    """
+    Signals of a Job. They are emitted from the worker thread and delivered
+    on the GUI thread, so slots can safely touch widgets.
+    """
+    started = pyqtSignal(object)
+    progress = pyqtSignal(object, int)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+    cancelled = pyqtSignal(object)
+
+
+class Job(QRunnable):
+    """
+    A cancellable unit of work run on the shared thread pool.
+    The function is called as fn(job, *args, **kwargs) and can use the job
+    to report progress, check for cancellation and run external commands.
+    """
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+
+    def __init__(self, title, fn, *args, **kwargs):
+        super().__init__()
+        # The runner keeps a reference, Qt must not delete the Python object
+        self.setAutoDelete(False)
+        self.title = title
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.status = Job.PENDING
+        self.result = None
+        self.error = None
+        self._cancel_event = threading.Event()
+        self._process = None
+
+    def run(self):
+        if self._cancel_event.is_set():
+            self._set_cancelled()
+            return
+
+        self.status = Job.RUNNING
+        self.signals.started.emit(self)
+        try:
+            self.result = self.fn(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            self._set_cancelled()
+        except Exception as e:
+            self.error = str(e)
+            self.status = Job.FAILED
+            self.signals.failed.emit(self, self.error)
+        else:
+            self.status = Job.DONE
+            self.signals.progress.emit(self, 100)
+            self.signals.finished.emit(self, self.result)
+
+    def _set_cancelled(self):
+        self.status = Job.CANCELLED
+        self.signals.cancelled.emit(self)
+
+    def cancel(self):
+        """
+        Ask the job to stop. A running external command is terminated.
+        """
+        self._cancel_event.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, percent):
+        self.signals.progress.emit(self, int(percent))
+
+    def run_process(self, args, shell=False):
+        """
+        Run an external command, terminating it if the job is cancelled.
+        Raises RuntimeError when the command fails.
+        """
+        self.check_cancelled()
+        self._process = subprocess.Popen(args, shell=shell, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            _, stderr = self._process.communicate()
+        finally:
+            returncode = self._process.returncode
+            self._process = None
+        self.check_cancelled()
+        if returncode != 0:
+            message = stderr.decode(errors="replace").strip() if stderr else ""
+            raise RuntimeError(message or f"Command exited with status {returncode}")
+
+
+class JobRunner(QObject):
+    """
+    Runs document jobs on a QThreadPool and keeps track of them for the job queue panel.
+    """
+    job_added = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.jobs = []
+
+    def submit(self, job):
+        """
+        Queue a job. Connect to its signals before submitting it,
+        a fast job may finish before submit returns.
+        """
+        self.jobs.append(job)
+        self.job_added.emit(job)
+        self.pool.start(job)
+        return job
+
+    def cancel(self, job):
+        if job.status == Job.PENDING and self.pool.tryTake(job):
+            job._set_cancelled()
+        else:
+            job.cancel()
+
+    def remove_finished(self):
+        self.jobs = [job for job in self.jobs if job.status in (Job.PENDING, Job.RUNNING)]
+
+
+_job_runner = None
+
+
+def get_job_runner():
+    """
+    Return the application-wide job runner, creating it on first use.
+    """
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner()
+    return _job_runner
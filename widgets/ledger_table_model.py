@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from data import ledger
+
+
+class LedgerTableModel(QAbstractTableModel):
+    """
+    Virtual table over the ledger entries, newest first.
+    The row count comes from the maintained totals and rows are loaded one
+    page at a time when the view paints them, with only the most recently
+    used pages kept in memory, so the view stays responsive with 100k+ entries.
+    """
+    PAGE_SIZE = 200
+    MAX_PAGES = 20
+    HEADERS = ["Date", "Startup / vendor", "Account", "Debit", "Credit", "Balance", "Description"]
+    AMOUNT_COLUMNS = (3, 4, 5)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pages = OrderedDict()
+        self.row_count = ledger.get_entry_count()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole and index.column() in self.AMOUNT_COLUMNS:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+
+        page = self.get_page(index.row() // self.PAGE_SIZE)
+        offset = index.row() % self.PAGE_SIZE
+        if offset >= len(page):
+            return None
+        value = page[offset][index.column()]
+        if index.column() in self.AMOUNT_COLUMNS:
+            # Show empty cells rather than 0.00 on the unused debit/credit side
+            return ledger.format_cents(value) if value or index.column() == 5 else ""
+        return value
+
+    def get_page(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            page = ledger.get_entries(self.PAGE_SIZE, number * self.PAGE_SIZE)
+            self.pages[number] = page
+            while len(self.pages) > self.MAX_PAGES:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(number)
+        return page
+
+    def reload(self):
+        self.beginResetModel()
+        self.pages.clear()
+        self.row_count = ledger.get_entry_count()
+        self.endResetModel()